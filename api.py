@@ -0,0 +1,118 @@
+"""
+Headless HTTP API over the question-answering Engine.
+
+    uvicorn api:app --host 0.0.0.0 --port 8000 --workers 4
+
+POST /ask takes {"question": "...", "filters": {"course": ["Biology"]}}
+and returns the answer, its chart spec and the per-stage timings. Each
+worker process loads the dataset once at startup and keeps one Engine,
+so requests skip Streamlit's per-session script reruns entirely. Workers
+share nothing but the on-disk dataset bundle and response cache, so the
+API scales horizontally behind any load balancer.
+
+GET /metrics serves this worker's per-stage latency quantiles and
+counters in the Prometheus text format; GET /metrics.json serves the
+same data as JSON.
+
+Follow-up questions ("and for females?") can send the earlier turns as
+"history": [{"role": "user", "content": "..."}, {"role": "assistant",
+"content": "..."}, ...]; the question is then resolved against them
+(see conversation.py) and the response's resolved_question says how.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+
+from conversation import Conversation
+from engine import Engine
+from metrics import METRICS, to_prometheus
+from refresh import REFRESH_INTERVAL
+from warmup import Warmup
+
+load_dotenv()
+
+
+class AskRequest(BaseModel):
+    question: str = Field(min_length=1, max_length=2000)
+    filters: dict[str, list[str]] = Field(default_factory=dict)
+    history: list[dict[str, str]] = Field(default_factory=list, max_length=200)
+
+
+class AskResponse(BaseModel):
+    answer: str
+    chart: dict | None
+    path: str
+    cached: bool
+    time: float
+    stages: dict[str, float]
+    context_tokens: int | None = None
+    resolved_question: str | None = None
+
+
+async def poll_sources(engine):
+    """Merge rows appended to the watched sources every REFRESH_INTERVAL seconds"""
+    while True:
+        await asyncio.sleep(REFRESH_INTERVAL)
+        try:
+            await asyncio.to_thread(engine.refresh)
+        except Exception:
+            pass  # keep serving the data already loaded
+
+
+@asynccontextmanager
+async def lifespan(app):
+    app.state.engine = Engine.from_env()
+    # Example questions are answered in the background at startup and after each refresh
+    app.state.warmup = Warmup(app.state.engine)
+    app.state.warmup.start()
+    poller = asyncio.create_task(poll_sources(app.state.engine))
+    yield
+    poller.cancel()
+
+
+app = FastAPI(title="Educational Data Chatbot API", lifespan=lifespan)
+
+
+@app.get("/health")
+async def health():
+    engine = app.state.engine
+    return {
+        "status": "ok",
+        "dataset_version": engine.version,
+        "records": engine.records,
+        "llm_in_flight": engine.client.in_flight,
+        "llm_waiting": engine.client.waiting,
+        "answer_paths": engine.answer_paths.snapshot(),
+        "warmup": app.state.warmup.status(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return to_prometheus(METRICS.snapshot(), app.state.engine.counters())
+
+
+@app.get("/metrics.json")
+async def metrics_json():
+    counters = app.state.engine.counters()
+    return {**METRICS.snapshot(), "counters": {metric: values for metric, (_, values) in counters.items()}}
+
+
+@app.post("/ask", response_model=AskResponse)
+async def ask(request: AskRequest):
+    engine = app.state.engine
+    if engine.client.waiting >= engine.client.max_queue:
+        raise HTTPException(status_code=503, detail="Too many questions are waiting - please try again shortly")
+
+    conversation = Conversation.from_messages(request.history, engine.router) if request.history else None
+    # smart_answer blocks on the LLM client's own loop; keep this loop free meanwhile
+    answer, chart, meta = await asyncio.to_thread(
+        engine.smart_answer, request.question, request.filters, conversation=conversation
+    )
+    if meta.get("error"):
+        raise HTTPException(status_code=502, detail=answer)
+    return AskResponse(answer=answer, chart=chart, **meta)
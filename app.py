@@ -1,18 +1,20 @@
 import streamlit as st
 import pandas as pd
+import hashlib
 import json
 import os
-from openai import OpenAI
 from datetime import datetime
 from dotenv import load_dotenv
 
-# Optional: try to import plotly for charts
-try:
-    import plotly.express as px
-    import plotly.graph_objects as go
-    CHARTS_ENABLED = True
-except ImportError:
-    CHARTS_ENABLED = False
+from batch import read_jobs, run_batch
+from charts import CHARTS_ENABLED, build_figure
+from conversation import Conversation
+from engine import Engine
+from llm_backends import make_client
+from memo import LRUCache
+from metrics import METRICS, to_prometheus
+from refresh import REFRESH_INTERVAL
+from warmup import EXAMPLE_QUESTIONS, Warmup
 
 load_dotenv()
 
@@ -558,39 +560,106 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # ==================================================
-# LOAD DATA
+# OPENAI CLIENT
 # ==================================================
-@st.cache_data
-def load_data():
-    df = pd.read_excel("Students_Dataset.xlsx")
-    return df
+@st.cache_resource
+def load_llm_client():
+    # One pooled async client (or the offline backend named by LLM_BACKEND) for every session
+    return make_client()
 
 try:
-    df = load_data()
-    total_students = df['student_id'].nunique()
-    total_assessments = len(df)
-    total_courses = df['course_name'].nunique()
-    total_levels = df['class_level'].nunique()
+    client = load_llm_client()
 except Exception as e:
-    st.error(f"❌ Error loading dataset: {e}")
+    st.error("⚠️ OpenAI API Key not found")
     st.stop()
 
 # ==================================================
-# OPENAI CLIENT
+# LOAD DATA
 # ==================================================
+@st.cache_resource
+def load_engine():
+    # Dataset, cube, filter index, router, caches and worker pool, shared by every session.
+    # The workbook is parsed once, then memory-mapped from the cached column bundle
+    # (or, with DATA_BACKEND=sqlite, queried out of core).
+    return Engine.from_env(client=load_llm_client())
+
 try:
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    engine = load_engine()
 except Exception as e:
-    st.error("⚠️ OpenAI API Key not found")
+    st.error(f"❌ Error loading dataset: {e}")
     st.stop()
 
+def refresh_data(min_interval):
+    """Merge rows appended to the watched sources instead of reloading everything"""
+    try:
+        new_rows = engine.refresh(min_interval=min_interval)
+    except Exception as e:
+        st.warning(f"⚠️ Could not refresh dataset: {e}")
+        return
+    if new_rows:
+        st.toast(f"📥 Loaded {new_rows:,} new assessments")
+    elif min_interval == 0:
+        st.toast("✅ Dataset is up to date")
+
+def check_for_new_data():
+    # Button callback: runs before the rerun, so the page renders the merged data
+    refresh_data(min_interval=0)
+
+refresh_data(min_interval=REFRESH_INTERVAL)
+
+total_students = len(engine.cube.students)
+total_assessments = engine.records
+total_courses = len(engine.cube.levels['course_name'])
+total_levels = len(engine.cube.levels['class_level'])
+
+@st.cache_resource
+def load_figure_cache():
+    # Plotly figures keyed by chart-spec hash, shared by every session
+    return LRUCache(max_entries=int(os.getenv("FIGURE_CACHE_SIZE", 128)))
+
+figure_cache = load_figure_cache()
+
+def render_chart(spec):
+    """Figure for a chart spec, built on first use and cached by spec hash"""
+    key = hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+    return figure_cache.get_or_compute(key, lambda: build_figure(spec))
+
+@st.cache_resource
+def load_warmup():
+    # Example answers and their figures, computed in the background at startup and after each refresh
+    warmup = Warmup(engine, on_chart=render_chart if CHARTS_ENABLED else None)
+    warmup.start()
+    return warmup
+
+warmup = load_warmup()
+
+# Latency panel for operators: ADMIN_PANEL=1 or ?admin=1
+SHOW_ADMIN = (os.getenv("ADMIN_PANEL", "").lower() in ("1", "true", "yes")
+              or st.query_params.get("admin") == "1")
+
+def metric_counters():
+    """Engine counters plus the figure cache"""
+    counters = engine.counters()
+    figures = figure_cache.stats()
+    for metric, key in (("cache_hits_total", "hits"), ("cache_misses_total", "misses"), ("cache_entries", "size")):
+        counters[metric][1]["figure"] = figures[key]
+    return counters
+
 # ==================================================
 # SESSION STATE
 # ==================================================
+HISTORY_WINDOW = 20   # messages shown before "Show earlier messages"
+CHART_WINDOW = 6      # most recent messages whose charts render automatically
+
 if "messages" not in st.session_state:
     st.session_state.messages = []
 if "filters" not in st.session_state:
     st.session_state.filters = {}
+if "history_window" not in st.session_state:
+    st.session_state.history_window = HISTORY_WINDOW
+# Follow-up resolution and a bounded digest of earlier turns for the prompt
+if "conversation" not in st.session_state:
+    st.session_state.conversation = Conversation()
 
 # ==================================================
 # SIDEBAR - FILTERS
@@ -601,31 +670,22 @@ with st.sidebar:
     
     filter_course = st.multiselect(
         "📚 Courses",
-        options=df['course_name'].unique(),
+        options=engine.cube.levels['course_name'],
         default=[]
     )
     
     filter_class = st.multiselect(
         "🎓 Class Levels",
-        options=df['class_level'].unique(),
+        options=engine.cube.levels['class_level'],
         default=[]
     )
     
     filter_gender = st.multiselect(
         "👥 Gender",
-        options=df['student_gender'].unique(),
+        options=engine.cube.levels['student_gender'],
         default=[]
     )
     
-    # Apply filters
-    filtered_df = df.copy()
-    if filter_course:
-        filtered_df = filtered_df[filtered_df['course_name'].isin(filter_course)]
-    if filter_class:
-        filtered_df = filtered_df[filtered_df['class_level'].isin(filter_class)]
-    if filter_gender:
-        filtered_df = filtered_df[filtered_df['student_gender'].isin(filter_gender)]
-    
     if filter_course or filter_class or filter_gender:
         st.session_state.filters = {
             'course': filter_course,
@@ -635,272 +695,88 @@ with st.sidebar:
     else:
         st.session_state.filters = {}
     
+    # Apply filters
+    summary = engine.summary(st.session_state.filters)
+    
     if st.button("🔄 Reset Filters", use_container_width=True):
         st.session_state.filters = {}
         st.rerun()
     
+    st.button("📥 Check for New Data", use_container_width=True, on_click=check_for_new_data)
+    
     st.markdown("---")
     st.markdown("### 📊 Filtered View")
-    st.metric("Records", len(filtered_df))
-    st.metric("Students", filtered_df['student_id'].nunique())
-    st.metric("Avg Score", f"{filtered_df['assessment_score'].mean():.1f}")
+    st.metric("Records", summary.records)
+    st.metric("Students", summary.students)
+    st.metric("Avg Score", f"{summary.means['assessment_score']:.1f}")
+    
+    st.markdown("---")
+    with st.expander("🗂️ Batch Questions"):
+        st.caption("Upload a CSV or JSONL of questions with optional course/class/gender filters")
+        batch_file = st.file_uploader("Questions file", type=["csv", "jsonl"], label_visibility="collapsed")
+        if batch_file is not None and st.button("▶️ Run Batch", use_container_width=True):
+            jobs = read_jobs(batch_file, batch_file.name)
+            progress = st.progress(0.0, text=f"0 / {len(jobs)} questions")
+            results = []
+            for result in run_batch(engine, jobs):
+                results.append(result)
+                progress.progress(len(results) / len(jobs), text=f"{len(results)} / {len(jobs)} questions")
+            st.session_state.batch_results = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in results)
+        if st.session_state.get("batch_results"):
+            st.download_button(
+                "📥 Download Batch Results",
+                st.session_state.batch_results,
+                f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl",
+                use_container_width=True
+            )
+    
+    if SHOW_ADMIN:
+        with st.expander("⏱️ Latency Panel"):
+            snapshot = METRICS.snapshot()
+            if snapshot["spans"]:
+                st.dataframe(pd.DataFrame([
+                    {"span": name, "count": stats["count"],
+                     **{q: stats[q] * 1000 for q in ("p50", "p95", "p99")}}
+                    for name, stats in snapshot["spans"].items()
+                ]).set_index("span").round(1), use_container_width=True)
+                st.caption(f"Milliseconds over the last {snapshot['window']} samples per span")
+            else:
+                st.caption("No answers timed yet")
+            for name, stats in snapshot["rates"].items():
+                st.metric(name.replace("_", " ").capitalize(), f"{stats['p50']:.0f}",
+                          help=f"p50 over {min(stats['count'], snapshot['window'])} samples")
+            status = warmup.status()
+            st.caption(f"Warm-up: {'running' if status['running'] else 'idle'} · "
+                       f"{status['answered']} answers ({status['errors']} errors) in {status['seconds']:.1f}s")
+            counters = metric_counters()
+            st.json({metric: values for metric, (_, values) in counters.items()}, expanded=False)
+            st.download_button("📥 Metrics JSON", json.dumps({**snapshot, "counters": counters}, indent=2),
+                               "metrics.json", use_container_width=True)
+            st.download_button("📥 Prometheus Text", to_prometheus(snapshot, counters),
+                               "metrics.prom", use_container_width=True)
 
 # ==================================================
 # SMART AI SYSTEM WITH VISUALIZATIONS
 # ==================================================
-
-def create_visualization(question, df_to_use):
-    """Generate chart for ANY statistical question - ENHANCED"""
-    if not CHARTS_ENABLED:
-        return None
-    
-    try:
-        q_lower = question.lower()
-        
-        # COMPARISON questions → Bar chart
-        if any(word in q_lower for word in ['compare', 'vs', 'versus', 'between', 'difference', 'better', 'best', 'worst', 'top', 'highest', 'lowest']):
-            
-            # Course comparison
-            if any(word in q_lower for word in ['course', 'subject', 'biology', 'computer', 'mathematics', 'science', 'chemistry', 'all']):
-                data = df_to_use.groupby('course_name')['assessment_score'].mean().sort_values(ascending=False)
-                fig = go.Figure(data=[
-                    go.Bar(x=data.index, y=data.values, 
-                           marker=dict(color=data.values, colorscale='Reds'),
-                           text=[f"{v:.1f}" for v in data.values],
-                           textposition='outside')
-                ])
-                fig.update_layout(title="📊 Course Performance", 
-                                  height=400, template="plotly_white",
-                                  yaxis_title="Average Score")
-                return fig
-            
-            # Gender comparison
-            elif any(word in q_lower for word in ['gender', 'male', 'female', 'boy', 'girl', 'm', 'f']):
-                data = df_to_use.groupby('student_gender')['assessment_score'].mean()
-                fig = go.Figure(data=[
-                    go.Bar(x=['Male' if x=='M' else 'Female' for x in data.index], 
-                           y=data.values,
-                           marker=dict(color=['#DC2626', '#991B1B']),
-                           text=[f"{v:.1f}" for v in data.values],
-                           textposition='outside')
-                ])
-                fig.update_layout(title="👥 Gender Performance",
-                                  height=400, template="plotly_white",
-                                  yaxis_title="Average Score")
-                return fig
-            
-            # Class level comparison
-            elif any(word in q_lower for word in ['class', 'level', 'c1', 'c2', 'c3', 'c4', 'c5']):
-                data = df_to_use.groupby('class_level')['assessment_score'].mean().sort_values(ascending=False)
-                fig = go.Figure(data=[
-                    go.Bar(x=data.index, y=data.values,
-                           marker=dict(color=data.values, colorscale='Reds'),
-                           text=[f"{v:.1f}" for v in data.values],
-                           textposition='outside')
-                ])
-                fig.update_layout(title="🎓 Class Performance",
-                                  height=400, template="plotly_white",
-                                  yaxis_title="Average Score")
-                return fig
-        
-        # DISTRIBUTION questions → Pie chart
-        if any(word in q_lower for word in ['distribution', 'breakdown', 'percentage', 'how many', 'split', 'divide']):
-            if 'gender' in q_lower:
-                data = df_to_use['student_gender'].value_counts()
-                fig = go.Figure(data=[go.Pie(
-                    labels=['Male' if x=='M' else 'Female' for x in data.index],
-                    values=data.values,
-                    hole=0.4,
-                    marker=dict(colors=['#DC2626', '#991B1B'])
-                )])
-                fig.update_layout(title="👥 Gender Distribution", height=400)
-                return fig
-            
-            elif 'course' in q_lower:
-                data = df_to_use['course_name'].value_counts()
-                fig = go.Figure(data=[go.Pie(
-                    labels=data.index,
-                    values=data.values,
-                    hole=0.4,
-                    marker=dict(colors=px.colors.sequential.Reds)
-                )])
-                fig.update_layout(title="📚 Course Distribution", height=400)
-                return fig
-            
-            elif 'class' in q_lower or 'level' in q_lower:
-                data = df_to_use['class_level'].value_counts()
-                fig = go.Figure(data=[go.Pie(
-                    labels=data.index,
-                    values=data.values,
-                    hole=0.4,
-                    marker=dict(colors=px.colors.sequential.Reds)
-                )])
-                fig.update_layout(title="🎓 Class Distribution", height=400)
-                return fig
-        
-        # CORRELATION questions → Scatter plot
-        if any(word in q_lower for word in ['correlation', 'relationship', 'affect', 'impact', 'influence', 'relate', 'connection', 'correlate']):
-            if 'attendance' in q_lower:
-                fig = px.scatter(df_to_use, x='attendance_rate', y='assessment_score',
-                                trendline="ols", color_discrete_sequence=['#DC2626'],
-                                title="📈 Attendance vs Performance")
-                fig.update_layout(height=400, template="plotly_white")
-                return fig
-            
-            elif any(word in q_lower for word in ['hand', 'participation', 'raise']):
-                fig = px.scatter(df_to_use, x='raised_hand_count', y='assessment_score',
-                                trendline="ols", color_discrete_sequence=['#991B1B'],
-                                title="✋ Participation vs Performance")
-                fig.update_layout(height=400, template="plotly_white")
-                return fig
-            
-            elif 'moodle' in q_lower:
-                fig = px.scatter(df_to_use, x='moodle_views', y='assessment_score',
-                                trendline="ols", color_discrete_sequence=['#DC2626'],
-                                title="👀 Moodle Usage vs Performance")
-                fig.update_layout(height=400, template="plotly_white")
-                return fig
-        
-        # AVERAGE questions → Show bar chart by default
-        if 'average' in q_lower or 'mean' in q_lower:
-            data = df_to_use.groupby('course_name')['assessment_score'].mean().sort_values(ascending=False)
-            fig = go.Figure(data=[
-                go.Bar(x=data.index, y=data.values,
-                       marker=dict(color=data.values, colorscale='Reds'),
-                       text=[f"{v:.1f}" for v in data.values],
-                       textposition='outside')
-            ])
-            fig.update_layout(title="📊 Average Scores",
-                              height=400, template="plotly_white",
-                              yaxis_title="Average Score")
-            return fig
-    
-    except Exception as e:
+def answer_caption(msg):
+    """Response-time caption shown under an assistant message"""
+    caption = f"⚡ Answered in {msg['time']:.2f}s"
+    if msg.get("ttft") is not None:
+        caption = f"⚡ First token in {msg['ttft']:.2f}s · answered in {msg['time']:.2f}s"
+    if msg.get("cached"):
+        caption += " · cache hit"
+    elif msg.get("path") == "local":
+        caption += " · computed locally"
+    if msg.get("resolved_question"):
+        caption += f" · ↪️ read as: {msg['resolved_question']}"
+    return caption
+
+def stage_breakdown(msg):
+    """Per-stage timings for the caption tooltip"""
+    stages = msg.get("stages")
+    if not stages:
         return None
-    
-    return None
-
-def smart_answer(question, df_to_use):
-    """ChatGPT-style responses - conversational, structured, insightful"""
-    
-    q_lower = question.lower()
-    
-    # Determine if this is a "big" question needing detailed response
-    is_big_question = any(word in q_lower for word in [
-        'everything', 'all', 'overview', 'summary', 'interesting', 
-        'insights', 'tell me about', 'what should', 'recommendations'
-    ])
-    
-    # Build context with relevant stats
-    context = f"""USER QUESTION: "{question}"
-
-DATASET: {len(df_to_use):,} assessments, {df_to_use['student_id'].nunique()} students
-Courses: {', '.join(df_to_use['course_name'].unique())}
-Overall Average: {df_to_use['assessment_score'].mean():.1f}/100
-"""
-
-    # Add relevant stats
-    if any(word in q_lower for word in ['course', 'biology', 'computer', 'math', 'science', 'chemistry']):
-        course_data = df_to_use.groupby('course_name')['assessment_score'].mean().sort_values(ascending=False)
-        context += f"\nCOURSE SCORES:\n{course_data.to_string()}\n"
-    
-    if any(word in q_lower for word in ['gender', 'male', 'female']):
-        gender_data = df_to_use.groupby('student_gender')['assessment_score'].mean()
-        context += f"\nGENDER SCORES: M={gender_data.get('M', 0):.1f}, F={gender_data.get('F', 0):.1f}\n"
-    
-    if any(word in q_lower for word in ['class', 'level']):
-        class_data = df_to_use.groupby('class_level')['assessment_score'].mean().sort_values(ascending=False)
-        context += f"\nCLASS SCORES:\n{class_data.to_string()}\n"
-    
-    if is_big_question:
-        # Add engagement stats for overview questions
-        context += f"""
-ENGAGEMENT STATS:
-- Avg Attendance: {df_to_use['attendance_rate'].mean():.1f}%
-- Avg Hand Raises: {df_to_use['raised_hand_count'].mean():.1f}
-- Avg Moodle Views: {df_to_use['moodle_views'].mean():.1f}
-- Avg Downloads: {df_to_use['resources_downloads'].mean():.1f}
-
-CORRELATIONS WITH SCORES:
-- Attendance: {df_to_use['attendance_rate'].corr(df_to_use['assessment_score']):.3f}
-- Hand Raises: {df_to_use['raised_hand_count'].corr(df_to_use['assessment_score']):.3f}
-- Moodle Views: {df_to_use['moodle_views'].corr(df_to_use['assessment_score']):.3f}
-"""
-
-    # Different prompts for big vs small questions
-    if is_big_question:
-        prompt = f"""{context}
-
-This is a BIG question - provide a DETAILED, INSIGHTFUL response like ChatGPT would.
-
-STYLE:
-- Start with ### and emoji
-- Use **bold** for emphasis
-- Break into SHORT sections with subheadings
-- Use bullet points for lists
-- 2-3 sentences per paragraph MAX
-- Focus on INSIGHTS, not just numbers
-- Be conversational and engaging
-
-STRUCTURE:
-### [Title]
-
-Brief intro (1-2 sentences)
-
-**Section 1:**
-- Point with data
-- Point with data
-
-**Section 2:**
-- Insight
-- Insight
-
-Final takeaway or recommendation.
-
-NOW ANSWER: "{question}"
-"""
-    else:
-        prompt = f"""{context}
-
-This is a SIMPLE question - provide a SHORT, DIRECT response like ChatGPT would.
-
-STYLE:
-- Start with ### and emoji
-- 2-4 sentences total
-- Use **bold** for key numbers
-- Conversational tone
-- Answer the EXACT question
-
-EXAMPLE:
-
-Q: "Compare Biology vs Computer"
-A: ### 📊 Biology vs Computer
-
-Computer students score **70.3** on average, while Biology students score **70.0**. Computer edges ahead by just 0.3 points - they're basically tied! Both perform right around the overall average.
-
-NOW ANSWER: "{question}"
-"""
-
-    try:
-        start_time = datetime.now()
-        
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.15,
-            max_tokens=400 if is_big_question else 200
-        )
-        
-        elapsed = (datetime.now() - start_time).total_seconds()
-        answer = response.choices[0].message.content.strip()
-        
-        # Generate visualization
-        chart = create_visualization(question, df_to_use)
-        
-        return answer, chart, elapsed
-    
-    except Exception as e:
-        return f"❌ Error: {str(e)}", None, 0
+    return " · ".join(f"{name} {seconds:.2f}s" for name, seconds in stages.items())
 
 # ==================================================
 # HEADER
@@ -969,18 +845,8 @@ if not st.session_state.messages:
     
     col1, col2 = st.columns(2)
     
-    examples = [
-        "📊 Compare all courses performance",
-        "👥 Show me gender performance breakdown",
-        "📈 What correlates with high scores?",
-        "🎯 Which class performs best?",
-        "🔍 How many students score above 80?",
-        "💡 Tell me something interesting about the data",
-        "⭐ Which course has the best students?",
-        "📉 Are there any concerning trends?"
-    ]
-    
-    for i, example in enumerate(examples):
+    # Answered ahead of time by the warm-up, so a click is served from the caches
+    for i, example in enumerate(EXAMPLE_QUESTIONS):
         col = col1 if i % 2 == 0 else col2
         with col:
             if st.button(example, key=f"ex_{i}"):
@@ -989,31 +855,44 @@ if not st.session_state.messages:
                 
                 # Get AI response immediately
                 with st.spinner("✨ Thinking..."):
-                    answer, chart, elapsed = smart_answer(example, filtered_df if st.session_state.filters else df)
+                    answer, chart, meta = engine.smart_answer(
+                        example, st.session_state.filters, conversation=st.session_state.conversation
+                    )
+                if not meta.get("error"):
+                    st.session_state.conversation.record(answer)
                 
                 # Add assistant message
                 st.session_state.messages.append({
                     "role": "assistant",
                     "content": answer,
                     "chart": chart,
-                    "time": elapsed
+                    **meta
                 })
                 st.rerun()
 
 # ==================================================
 # DISPLAY CHAT
 # ==================================================
-for i, msg in enumerate(st.session_state.messages):
+# Long conversations only re-render a recent window of messages
+n_messages = len(st.session_state.messages)
+first_shown = max(0, n_messages - st.session_state.history_window)
+if first_shown > 0:
+    if st.button(f"⬆️ Show earlier messages ({first_shown} hidden)", key="show_earlier"):
+        st.session_state.history_window += HISTORY_WINDOW
+        st.rerun()
+
+for i, msg in enumerate(st.session_state.messages[first_shown:], start=first_shown):
     with st.chat_message(msg["role"], avatar="🤖" if msg["role"] == "assistant" else "👤"):
         st.markdown(msg["content"])
         
-        # Show chart if exists with unique key
-        if msg["role"] == "assistant" and "chart" in msg and msg["chart"]:
-            st.plotly_chart(msg["chart"], use_container_width=True, key=f"chart_{i}")
+        # Show chart if exists with unique key; older charts render on demand
+        if msg["role"] == "assistant" and "chart" in msg and msg["chart"] and CHARTS_ENABLED:
+            if i >= n_messages - CHART_WINDOW or st.toggle("📊 Show chart", key=f"show_chart_{i}"):
+                st.plotly_chart(render_chart(msg["chart"]), use_container_width=True, key=f"chart_{i}")
         
         # Show response time
         if msg["role"] == "assistant" and "time" in msg:
-            st.caption(f"⚡ Answered in {msg['time']:.2f}s")
+            st.caption(answer_caption(msg), help=stage_breakdown(msg))
 
 # ==================================================
 # CHAT INPUT
@@ -1027,23 +906,30 @@ if prompt := st.chat_input("💭 Ask me anything about the student data... I can
     # Get AI response with professional loading
     with st.chat_message("assistant", avatar="🤖"):
         with st.spinner("✨ Thinking..."):
-            answer, chart, elapsed = smart_answer(prompt, filtered_df if st.session_state.filters else df)
+            tokens, chart, meta = engine.smart_answer(
+                prompt, st.session_state.filters, stream=True, conversation=st.session_state.conversation
+            )
         
-        st.markdown(answer)
+        # Render tokens as they arrive instead of waiting for the full completion
+        answer = st.write_stream(tokens)
+        if not meta.get("error"):
+            st.session_state.conversation.record(answer)
+        chart = chart.result()
         
         # Show chart with unique key
-        if chart:
+        if chart and CHARTS_ENABLED:
             chart_key = f"chart_{len(st.session_state.messages)}"
-            st.plotly_chart(chart, use_container_width=True, key=chart_key)
+            with METRICS.span("render"):
+                st.plotly_chart(render_chart(chart), use_container_width=True, key=chart_key)
         
-        st.caption(f"⚡ Answered in {elapsed:.2f}s")
+        st.caption(answer_caption(meta), help=stage_breakdown(meta))
     
     # Add to history
     st.session_state.messages.append({
         "role": "assistant",
         "content": answer,
         "chart": chart,
-        "time": elapsed
+        **meta
     })
 
 # ==================================================
@@ -0,0 +1,163 @@
+"""
+Batch question answering.
+
+Reads (question, filters) rows from CSV or JSONL and answers them through
+the Engine. Repeated (question, filters) pairs are answered once, jobs
+are grouped by filter combination so each Summary is computed once, and
+LLM calls run concurrently under the client's concurrency and rate
+limits. Results are appended to a JSONL file as they complete. Rerunning
+with the same output file skips jobs that already succeeded, so an
+interrupted run resumes where it stopped.
+
+    python batch.py questions.csv -o results.jsonl --workers 8 --rate 5
+
+CSV files have a question column plus optional course, class and gender
+columns (several values separated by "|"), or a filters column holding
+JSON. JSONL rows look like {"question": "...", "filters": {"course": ["Biology"]}}.
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dotenv import load_dotenv
+
+from cube import FILTER_KEYS
+from engine import Engine
+from filter_index import canonical_filters
+from llm_backends import make_client
+from llm_client import MAX_RATE
+from response_cache import normalize_question
+
+
+def job_id(question, filters):
+    """Stable id for a (question, filters) pair, shared by its duplicates"""
+    key = normalize_question(question) + "\x1f" + canonical_filters(filters)
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def _values(value):
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(v).strip() for v in value if str(v).strip()]
+    return [v.strip() for v in str(value).split("|") if v.strip()]
+
+
+def parse_filters(row):
+    """Filters dict from a row's filters JSON or its course/class/gender columns"""
+    raw = row.get("filters")
+    if isinstance(raw, str) and raw.strip():
+        raw = json.loads(raw)
+    source = raw if isinstance(raw, dict) else row
+    filters = {key: _values(source.get(key)) for key in FILTER_KEYS}
+    return {key: values for key, values in filters.items() if values}
+
+
+def read_jobs(source, name=None):
+    """Unique jobs from a CSV/JSONL path or file object, in first-seen order
+
+    name decides the format for file objects (e.g. an upload's file name).
+    """
+    name = name or (source if isinstance(source, str) else getattr(source, "name", ""))
+    if isinstance(source, str):
+        with open(source, encoding="utf-8") as f:
+            text = f.read()
+    else:
+        text = source.read()
+        text = text.decode("utf-8") if isinstance(text, bytes) else text
+    text = text.lstrip("\ufeff")
+
+    if str(name).lower().endswith((".jsonl", ".json")):
+        rows = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        rows = list(csv.DictReader(io.StringIO(text)))
+
+    jobs = {}
+    for row in rows:
+        question = (row.get("question") or "").strip()
+        if not question:
+            continue
+        filters = parse_filters(row)
+        jobs.setdefault(job_id(question, filters), {
+            "id": job_id(question, filters), "question": question, "filters": filters,
+        })
+    return list(jobs.values())
+
+
+def completed_ids(path):
+    """Ids already answered successfully in an earlier run's output"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by an interrupted run
+            if not result.get("error"):
+                done.add(result["id"])
+    return done
+
+
+def run_batch(engine, jobs, workers=8):
+    """Answer jobs concurrently, yielding one result dict per job as it completes"""
+    # Each filter combination's Summary is built once, before its questions fan out
+    jobs = sorted(jobs, key=lambda job: canonical_filters(job["filters"]))
+    for filters in {canonical_filters(job["filters"]): job["filters"] for job in jobs}.values():
+        engine.summary(filters)
+
+    def answer(job):
+        text, chart, meta = engine.smart_answer(job["question"], job["filters"])
+        return {**job, "answer": text, "chart": chart, **meta}
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as pool:
+        futures = [pool.submit(answer, job) for job in jobs]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Answer a file of questions in bulk")
+    parser.add_argument("input", help="CSV or JSONL file of questions and filters")
+    parser.add_argument("-o", "--output", help="JSONL results file (default: <input>.results.jsonl)")
+    parser.add_argument("--workers", type=int, default=8, help="questions answered concurrently")
+    parser.add_argument("--rate", type=float, default=None, help="max LLM requests per second")
+    parser.add_argument("--data", default=None, help="dataset workbook (default: the configured backend)")
+    args = parser.parse_args(argv)
+    load_dotenv()
+
+    output = args.output or os.path.splitext(args.input)[0] + ".results.jsonl"
+    jobs = read_jobs(args.input)
+    done = completed_ids(output)
+    pending = [job for job in jobs if job["id"] not in done]
+    print(f"{len(jobs)} unique questions, {len(jobs) - len(pending)} already answered", file=sys.stderr)
+    if not pending:
+        return 0
+
+    client = make_client(max_rate=MAX_RATE if args.rate is None else args.rate)
+    if args.data:
+        engine = Engine.from_path(args.data, client=client)
+    else:
+        engine = Engine.from_env(client=client)
+
+    paths = Counter()
+    with open(output, "a", encoding="utf-8") as out:
+        for n, result in enumerate(run_batch(engine, pending, workers=args.workers), start=1):
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            paths["error" if result.get("error") else result["path"]] += 1
+            print(f"[{n}/{len(pending)}] {result['path']:5} {result['time']:6.2f}s  {result['question']}",
+                  file=sys.stderr)
+
+    print(" · ".join(f"{path} {count}" for path, count in sorted(paths.items())), file=sys.stderr)
+    return 1 if paths["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
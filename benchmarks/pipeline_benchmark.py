@@ -0,0 +1,305 @@
+"""
+Load test of the chat pipeline on synthetic data, offline LLM backend.
+
+    python benchmarks/pipeline_benchmark.py --rows 10000,100000,1000000 --sessions 1,8,32 \\
+        --out bench/latest.json [--baseline bench/main.json --tolerance 0.25]
+
+For every table size (see synthetic.py; 10M rows needs a few GB of RAM)
+the run records:
+
+- load: schema validation and the engine build (cube, filter index),
+  or the store import and cube queries with --backend sqlite
+- stages: best-of --repeat timings of filter, stats, student table,
+  local answer, prompt build and chart build, per example question
+  and sidebar filter set, reported as the median and the worst case
+- sessions: N threads sharing one Engine, as Streamlit sessions share
+  the cached one, each streaming --questions answers with random
+  filters; per-answer latency and TTFT quantiles, throughput, the
+  answer-path mix and the METRICS span quantiles of the run
+
+Answers come from the offline "stub" backend (see llm_backends.py),
+an OpenAI-compatible server started in-process with --latency and
+--token-delay, unless --llm template skips HTTP altogether or --llm-url
+points at another server. Results go to --out as
+JSON. With --baseline, the run exits 1 when a stage median or an answer
+p95 is more than --tolerance slower than the baseline file's.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from charts import create_visualization  # noqa: E402
+from engine import Engine  # noqa: E402
+from llm_backends import TemplateBackend, start_stub  # noqa: E402
+from llm_client import LLMClient  # noqa: E402
+from local_answers import answer_locally  # noqa: E402
+from metrics import METRICS, QUANTILES  # noqa: E402
+from response_cache import ResponseCache  # noqa: E402
+from schema import apply_schema  # noqa: E402
+from stats import summarize  # noqa: E402
+from store import CHUNK_ROWS, SQLiteStore  # noqa: E402
+from synthetic import synthetic_dataset  # noqa: E402
+
+# The app's example questions plus the numeric questions answered locally
+QUESTIONS = [
+    "Compare all courses performance",
+    "Show me gender performance breakdown",
+    "What correlates with high scores?",
+    "Which class performs best?",
+    "How many students score above 80?",
+    "Tell me something interesting about the data",
+    "Which course has the best students?",
+    "Are there any concerning trends?",
+    "Is attendance correlated with performance?",
+    "Show the course distribution",
+    "How many students are there?",
+    "What is the average score?",
+    "Who are the top 10 students?",
+    "Which students are at risk?",
+]
+
+FILTER_SETS = [
+    {},
+    {"course": ["Biology"]},
+    {"course": ["Biology", "Computer"], "gender": ["F"]},
+    {"class": ["C1", "C2"]},
+    {"course": ["Mathematics"], "class": ["C3"], "gender": ["M"]},
+]
+
+# Stage slowdowns smaller than this are timer noise, whatever the ratio
+MIN_REGRESSION_S = 0.0005
+
+
+def best_of(repeat, func, *args):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def quantiles(values):
+    if not values:
+        return {}
+    return {f"p{round(q * 100)}": float(v) for q, v in zip(QUANTILES, np.quantile(values, QUANTILES))}
+
+
+def build_engine(df, args, client, workdir):
+    """Engine over df for args.backend; returns (engine, load timings)"""
+    response_cache = ResponseCache(":memory:", max_entries=2000 if args.response_cache else 0)
+    load = {}
+    start = time.perf_counter()
+    df = apply_schema(df)
+    load["schema_s"] = time.perf_counter() - start
+
+    if args.backend == "sqlite":
+        store = SQLiteStore(os.path.join(workdir, f"store_{len(df)}.sqlite3"))
+        start = time.perf_counter()
+        store.import_frames(df.iloc[i:i + CHUNK_ROWS] for i in range(0, len(df), CHUNK_ROWS))
+        load["store_import_s"] = time.perf_counter() - start
+        df = None
+    else:
+        store = None
+
+    start = time.perf_counter()
+    engine = Engine(df, f"synthetic-{args.seed}", client=client, response_cache=response_cache, store=store)
+    load["engine_build_s"] = time.perf_counter() - start
+    return engine, load
+
+
+def stage_timings(engine, repeat):
+    """Median and worst best-of-repeat time of each cold stage over questions x filter sets"""
+    samples = {"filter": [], "stats": [], "students": [], "local": [], "prompt": [], "chart": []}
+    routes = [engine.router.classify(question) for question in QUESTIONS]
+    for filters in FILTER_SETS:
+        samples["filter"].append(best_of(repeat, engine.select, filters))
+        samples["stats"].append(best_of(repeat, lambda: summarize(engine.cube.select(filters))))
+        samples["students"].append(best_of(repeat, engine.students.table, filters))
+        selection = engine.select(filters)
+        summary = summarize(engine.cube.select(filters))
+        students = engine.students.table(filters)
+        for question, route in zip(QUESTIONS, routes):
+            samples["local"].append(best_of(repeat, answer_locally, route, selection, summary, students))
+            samples["prompt"].append(best_of(repeat, engine.build_prompt, question, summary, route, students))
+            samples["chart"].append(best_of(repeat, create_visualization, route, selection, summary))
+    return {stage: {"median_s": float(np.median(times)), "max_s": float(max(times))}
+            for stage, times in samples.items()}
+
+
+def run_sessions(engine, sessions, questions, seed):
+    """Stream answers from `sessions` concurrent threads sharing engine"""
+    METRICS.clear()
+    engine.summary_cache.clear()
+    engine.response_cache.clear()
+    answers, ttfts, paths, errors = [], [], Counter(), []
+    lock = threading.Lock()
+    barrier = threading.Barrier(sessions + 1)
+
+    def session(number):
+        rng = random.Random(seed * 1000 + number)
+        barrier.wait()
+        for _ in range(questions):
+            question, filters = rng.choice(QUESTIONS), rng.choice(FILTER_SETS)
+            start = time.perf_counter()
+            tokens, chart, meta = engine.smart_answer(question, filters, stream=True)
+            for _ in tokens:
+                pass
+            chart.result()
+            elapsed = time.perf_counter() - start
+            with lock:
+                answers.append(elapsed)
+                paths[meta["path"]] += 1
+                if meta.get("ttft") is not None:
+                    ttfts.append(meta["ttft"])
+                if meta.get("error"):
+                    errors.append(question)
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    snapshot = METRICS.snapshot()
+    return {
+        "sessions": sessions,
+        "answers": len(answers),
+        "errors": len(errors),
+        "wall_s": wall,
+        "answers_per_s": len(answers) / wall,
+        "answer_s": quantiles(answers),
+        "ttft_s": quantiles(ttfts),
+        "paths": dict(paths),
+        "spans": snapshot["spans"],
+        "rates": snapshot["rates"],
+    }
+
+
+def regressions(results, baseline, tolerance):
+    """Messages for every stage median or answer p95 slower than baseline by more than tolerance
+
+    Stage medians must also be MIN_REGRESSION_S slower in absolute terms.
+    """
+    found = []
+    before_runs = {(r["rows"], r["backend"]): r for r in baseline["runs"]}
+    for run in results["runs"]:
+        before = before_runs.get((run["rows"], run["backend"]))
+        if before is None:
+            continue
+        label = f"{run['rows']:,} rows/{run['backend']}"
+        for stage, stats in run["stages"].items():
+            old = before["stages"].get(stage, {}).get("median_s")
+            if old and stats["median_s"] > max(old * (1 + tolerance), old + MIN_REGRESSION_S):
+                found.append(f"{label}: {stage} median {old * 1000:.2f} -> {stats['median_s'] * 1000:.2f} ms")
+        old_sessions = {s["sessions"]: s for s in before["sessions"]}
+        for result in run["sessions"]:
+            old = old_sessions.get(result["sessions"], {}).get("answer_s", {}).get("p95")
+            new = result["answer_s"].get("p95")
+            if old and new and new > old * (1 + tolerance):
+                found.append(f"{label}: {result['sessions']} sessions answer p95 {old:.3f} -> {new:.3f} s")
+    return found
+
+
+def _sizes(text):
+    return [int(float(size)) for size in text.split(",")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=_sizes, default=[10_000, 100_000, 1_000_000],
+                        help="comma-separated table sizes, e.g. 1e4,1e5,1e6,1e7")
+    parser.add_argument("--courses", type=int, default=5)
+    parser.add_argument("--classes", type=int, default=5)
+    parser.add_argument("--sessions", type=_sizes, default=[1, 8, 32], help="comma-separated session counts")
+    parser.add_argument("--questions", type=int, default=10, help="answers streamed per session")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per stage timing; the best is kept")
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--llm", choices=["stub", "template"], default="stub", help="offline completion backend")
+    parser.add_argument("--latency", type=float, default=0.4, help="LLM seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="LLM seconds between tokens")
+    parser.add_argument("--llm-url", help="use this OpenAI-compatible base URL instead of the stub")
+    parser.add_argument("--no-response-cache", dest="response_cache", action="store_false",
+                        help="send every non-local question to the LLM")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the JSON results to this file")
+    parser.add_argument("--json", action="store_true", help="print the JSON results instead of a table")
+    parser.add_argument("--baseline", help="earlier --out file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before failing")
+    args = parser.parse_args(argv)
+
+    if args.llm_url:
+        client = LLMClient(api_key=os.getenv("OPENAI_API_KEY", "stub"), base_url=args.llm_url)
+    elif args.llm == "template":
+        client = TemplateBackend(latency=args.latency, token_delay=args.token_delay)
+    else:
+        _, base_url = start_stub(latency=args.latency, token_delay=args.token_delay)
+        client = LLMClient(api_key="stub", base_url=base_url, name="stub")
+
+    results = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": {"python": platform.python_version(), "pandas": pd.__version__,
+                        "numpy": np.__version__, "cpus": os.cpu_count(), "platform": platform.platform()},
+        "config": {key: value for key, value in vars(args).items() if key not in ("out", "json", "baseline")},
+        "runs": [],
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in args.rows:
+            df = synthetic_dataset(rows, args.courses, args.classes, args.seed)
+            engine, load = build_engine(df, args, client, workdir)
+            del df
+            run = {"rows": rows, "backend": args.backend, "students": len(engine.cube.students),
+                   "load": load, "stages": stage_timings(engine, args.repeat),
+                   "sessions": [run_sessions(engine, n, args.questions, args.seed) for n in args.sessions]}
+            results["runs"].append(run)
+            engine.executor.shutdown()
+            print(f"{rows:,} rows done", file=sys.stderr)
+
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for run in results["runs"]:
+            load = " · ".join(f"{name[:-2]} {seconds * 1000:.0f} ms" for name, seconds in run["load"].items())
+            print(f"\n{run['rows']:,} rows ({run['backend']}) · {load}")
+            for stage, stats in run["stages"].items():
+                print(f"  {stage:<9}median {stats['median_s'] * 1000:8.3f} ms   max {stats['max_s'] * 1000:8.3f} ms")
+            for result in run["sessions"]:
+                answer = result["answer_s"]
+                print(f"  {result['sessions']:>3} sessions  {result['answers_per_s']:6.1f} answers/s   "
+                      f"p50 {answer['p50']:.3f} s  p95 {answer['p95']:.3f} s  p99 {answer['p99']:.3f} s   "
+                      f"errors {result['errors']}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for message in found:
+            print(f"REGRESSION {message}", file=sys.stderr)
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
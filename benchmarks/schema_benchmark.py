@@ -0,0 +1,79 @@
+"""
+Memory and groupby cost of the raw workbook dtypes versus schema.py.
+
+    python benchmarks/schema_benchmark.py --scale 50 --repeat 20 [--json]
+
+The workbook is tiled --scale times (with fresh student ids) so timings
+reflect a realistically sized dataset rather than timer noise.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import DATA_PATH  # noqa: E402
+from schema import apply_schema  # noqa: E402
+
+
+def tiled(df, scale):
+    step = int(df["student_id"].max()) + 1
+    frames = [df.assign(student_id=df["student_id"] + i * step) for i in range(scale)]
+    return pd.concat(frames, ignore_index=True)
+
+
+def best_of(repeat, func):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def measure(df, repeat):
+    observed = {"observed": True} if isinstance(df["course_name"].dtype, pd.CategoricalDtype) else {}
+    return {
+        "memory_bytes": int(df.memory_usage(deep=True).sum()),
+        "groupby_course_s": best_of(repeat, lambda: df.groupby("course_name", **observed)["assessment_score"].mean()),
+        "groupby_3_dims_s": best_of(repeat, lambda: df.groupby(
+            ["course_name", "class_level", "student_gender"], **observed)["assessment_score"].agg(["mean", "std"])),
+        "filter_course_s": best_of(repeat, lambda: df[df["course_name"] == "Biology"]),
+        "factorize_course_s": best_of(repeat, lambda: pd.factorize(df["course_name"])),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--scale", type=int, default=50, help="times to tile the workbook")
+    parser.add_argument("--repeat", type=int, default=20, help="runs per timing; the best is kept")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args(argv)
+
+    raw = tiled(pd.read_excel(args.data), args.scale)
+    start = time.perf_counter()
+    compact = apply_schema(raw)
+    schema_s = time.perf_counter() - start
+
+    results = {"rows": len(raw), "apply_schema_s": schema_s,
+               "raw": measure(raw, args.repeat), "compact": measure(compact, args.repeat)}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{results['rows']:,} rows · apply_schema {schema_s * 1000:.1f} ms")
+    print(f"{'metric':<22}{'raw':>14}{'compact':>14}{'ratio':>9}")
+    for metric, before in results["raw"].items():
+        after = results["compact"][metric]
+        unit = (lambda v: f"{v / 1e6:.2f} MB") if metric == "memory_bytes" else (lambda v: f"{v * 1000:.2f} ms")
+        print(f"{metric:<22}{unit(before):>14}{unit(after):>14}{before / after:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Synthetic tables shaped like Students_Dataset.xlsx, at any size.
+
+    python benchmarks/synthetic.py --rows 1000000 --csv data/synthetic.csv
+    python benchmarks/synthetic.py --rows 10000000 --store .data_cache/assessments.sqlite3
+
+Like the workbook, every student belongs to one class level and sits
+four assessments in every course; --courses and --classes add levels
+beyond the workbook's five of each. Scores rise with attendance and
+engagement plus a per-student effect, so correlation questions and
+scatter trendlines have something to find. Output is deterministic for
+a given --seed, and frames come back already in schema.py's dtypes.
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from schema import SCHEMA  # noqa: E402
+from store import CHUNK_ROWS, SQLiteStore  # noqa: E402
+
+COURSES = ["Mathematics", "Science", "Biology", "Chemistry", "Computer"]
+ASSESSMENTS = 4
+FIRST_STUDENT_ID = 1000
+
+
+def _levels(names, n, prefix):
+    return (names + [f"{prefix}{i}" for i in range(len(names) + 1, n + 1)])[:n]
+
+
+def _categorical(codes, categories):
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+
+def synthetic_dataset(rows, courses=5, classes=5, seed=0):
+    """A frame of `rows` assessments with SCHEMA dtypes"""
+    rng = np.random.default_rng(seed)
+    per_student = courses * ASSESSMENTS
+    n_students = -(-rows // per_student)
+
+    # Student-level attributes, then broadcast to one row per course and assessment
+    student = np.repeat(np.arange(n_students, dtype=np.int32), per_student)[:rows]
+    within = np.tile(np.arange(per_student, dtype=np.int32), n_students)[:rows]
+    gender = rng.integers(0, 2, n_students, dtype=np.int8)
+    class_level = rng.integers(0, classes, n_students, dtype=np.int16)
+    ability = rng.normal(0, 8, n_students)
+
+    attendance = rng.integers(40, 101, rows)
+    raised_hands = rng.integers(0, 21, rows)
+    moodle = rng.integers(0, 51, rows)
+    downloads = rng.integers(0, 21, rows)
+    score = (30 + 0.45 * attendance + 0.6 * raised_hands + 0.1 * moodle
+             + ability[student] + rng.normal(0, 10, rows))
+
+    ids = np.arange(FIRST_STUDENT_ID, FIRST_STUDENT_ID + n_students, dtype=np.int32)
+    df = pd.DataFrame({
+        "student_id": ids[student],
+        "student_name": _categorical(student, [f"Student_{i}" for i in ids]),
+        "student_gender": _categorical(gender[student], ["F", "M"]),
+        "class_level": _categorical(class_level[student], _levels(["C1", "C2", "C3", "C4", "C5"], classes, "C")),
+        "course_name": _categorical(within // ASSESSMENTS, _levels(COURSES, courses, "Course_")),
+        "assessment_no": within % ASSESSMENTS + 1,
+        "assessment_score": np.clip(np.rint(score), 0, 100),
+        "raised_hand_count": raised_hands,
+        "moodle_views": moodle,
+        "attendance_rate": attendance,
+        "resources_downloads": downloads,
+    })
+    return df.astype({col: dtype for col, dtype in SCHEMA.items() if dtype != "category"})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--courses", type=int, default=5)
+    parser.add_argument("--classes", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument("--csv", help="write the table to this CSV file")
+    output.add_argument("--store", help="append the table to this SQLite store (see store.py)")
+    args = parser.parse_args(argv)
+
+    df = synthetic_dataset(args.rows, args.courses, args.classes, args.seed)
+    if args.csv:
+        os.makedirs(os.path.dirname(args.csv) or ".", exist_ok=True)
+        df.to_csv(args.csv, index=False)
+        print(f"{args.csv}: {len(df):,} rows", file=sys.stderr)
+    else:
+        store = SQLiteStore(args.store)
+        store.import_frames(df.iloc[i:i + CHUNK_ROWS] for i in range(0, len(df), CHUNK_ROWS))
+        print(f"{args.store}: {len(store):,} rows", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Chart specs and their Plotly figures.
+
+create_visualization picks a chart for a question's Route and returns a
+compact, JSON-serializable spec. Specs are what get stored in chat
+history, written to batch results and returned by the API; build_figure
+turns one into a Plotly figure only when it is drawn.
+"""
+import numpy as np
+
+from cube import TARGET
+
+# Optional: try to import plotly for charts
+try:
+    import plotly.express as px
+    import plotly.graph_objects as go
+    CHARTS_ENABLED = True
+except ImportError:
+    CHARTS_ENABLED = False
+
+MAX_SCATTER_POINTS = 2000
+
+
+def bar_spec(title, data, labels=None, colors=None):
+    """Bar-chart spec for a Series of average scores"""
+    return {
+        "kind": "bar",
+        "title": title,
+        "x": labels or [str(x) for x in data.index],
+        "y": [float(v) for v in data.values],
+        "colors": colors,
+        "yaxis_title": "Average Score"
+    }
+
+
+def pie_spec(title, data, labels=None, colors=None):
+    """Pie-chart spec for a Series of counts"""
+    return {
+        "kind": "pie",
+        "title": title,
+        "labels": labels or [str(x) for x in data.index],
+        "values": [int(v) for v in data.values],
+        "colors": colors
+    }
+
+
+def scatter_spec(title, selection, summary, column, color):
+    """Scatter-chart spec: a bounded sample of points plus the least-squares trendline
+
+    The trendline comes from the summary's moments, so only the sampled
+    points are ever gathered from the selected rows.
+    """
+    if summary.records < 2:
+        return None
+
+    slope = summary.correlations[column] * summary.stds[TARGET] / summary.stds[column]
+    if not np.isfinite(slope):
+        slope = 0.0
+    intercept = summary.means[TARGET] - slope * summary.means[column]
+    points = selection.sample([column, TARGET], MAX_SCATTER_POINTS)
+
+    return {
+        "kind": "scatter",
+        "title": title,
+        "x_label": column,
+        "x": points[column].tolist(),
+        "y": points[TARGET].tolist(),
+        "color": color,
+        "trend": [float(slope), float(intercept)]
+    }
+
+
+def create_visualization(route, selection, summary):
+    """Generate chart for ANY statistical question - ENHANCED
+
+    Returns a compact chart spec (see build_figure) rather than a Figure.
+    Bar and pie charts read their aggregates from summary; only the
+    scatter plots touch the selected rows, to sample the points they plot.
+    """
+    try:
+        # COMPARISON questions → Bar chart
+        if route.has('compare'):
+
+            # Course comparison
+            if route.has('course') or route.matched('all'):
+                data = summary.scores_by('course_name').sort_values(ascending=False)
+                return bar_spec("📊 Course Performance", data)
+
+            # Gender comparison
+            elif route.has('gender'):
+                data = summary.scores_by('student_gender')
+                return bar_spec("👥 Gender Performance", data,
+                                labels=['Male' if x=='M' else 'Female' for x in data.index],
+                                colors=['#DC2626', '#991B1B'])
+
+            # Class level comparison
+            elif route.has('class'):
+                data = summary.scores_by('class_level').sort_values(ascending=False)
+                return bar_spec("🎓 Class Performance", data)
+
+        # DISTRIBUTION questions → Pie chart
+        if route.has('distribution'):
+            if route.has('gender'):
+                data = summary.group_counts['student_gender']
+                return pie_spec("👥 Gender Distribution", data,
+                                labels=['Male' if x=='M' else 'Female' for x in data.index],
+                                colors=['#DC2626', '#991B1B'])
+
+            elif route.has('course'):
+                data = summary.group_counts['course_name']
+                return pie_spec("📚 Course Distribution", data)
+
+            elif route.has('class'):
+                data = summary.group_counts['class_level']
+                return pie_spec("🎓 Class Distribution", data)
+
+        # CORRELATION questions → Scatter plot
+        if route.has('correlation'):
+            if route.has('attendance'):
+                return scatter_spec("📈 Attendance vs Performance", selection, summary, 'attendance_rate', '#DC2626')
+
+            elif route.has('participation'):
+                return scatter_spec("✋ Participation vs Performance", selection, summary, 'raised_hand_count', '#991B1B')
+
+            elif route.has('moodle'):
+                return scatter_spec("👀 Moodle Usage vs Performance", selection, summary, 'moodle_views', '#DC2626')
+
+        # AVERAGE questions → Show bar chart by default
+        if route.has('average'):
+            data = summary.scores_by('course_name').sort_values(ascending=False)
+            return bar_spec("📊 Average Scores", data)
+
+    except Exception as e:
+        return None
+
+    return None
+
+
+def build_figure(spec):
+    """Turn a chart spec from create_visualization into a Plotly figure"""
+    if not CHARTS_ENABLED:
+        return None
+
+    if spec["kind"] == "bar":
+        if spec["colors"]:
+            marker = dict(color=spec["colors"])
+        else:
+            marker = dict(color=spec["y"], colorscale='Reds')
+        fig = go.Figure(data=[
+            go.Bar(x=spec["x"], y=spec["y"],
+                   marker=marker,
+                   text=[f"{v:.1f}" for v in spec["y"]],
+                   textposition='outside')
+        ])
+        fig.update_layout(title=spec["title"],
+                          height=400, template="plotly_white",
+                          yaxis_title=spec["yaxis_title"])
+        return fig
+
+    if spec["kind"] == "pie":
+        fig = go.Figure(data=[go.Pie(
+            labels=spec["labels"],
+            values=spec["values"],
+            hole=0.4,
+            marker=dict(colors=spec["colors"] or px.colors.sequential.Reds)
+        )])
+        fig.update_layout(title=spec["title"], height=400)
+        return fig
+
+    if spec["kind"] == "scatter":
+        slope, intercept = spec["trend"]
+        x_range = [min(spec["x"]), max(spec["x"])]
+        fig = go.Figure(data=[
+            go.Scatter(x=spec["x"], y=spec["y"], mode='markers',
+                       marker=dict(color=spec["color"]), name="Assessments"),
+            go.Scatter(x=x_range, y=[slope * x + intercept for x in x_range], mode='lines',
+                       line=dict(color=spec["color"]), name="Trend")
+        ])
+        fig.update_layout(title=spec["title"], height=400, template="plotly_white",
+                          xaxis_title=spec["x_label"], yaxis_title="assessment_score",
+                          showlegend=False)
+        return fig
+
+    return None
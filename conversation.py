@@ -0,0 +1,177 @@
+"""
+Multi-turn context for follow-up questions.
+
+smart_answer only ever sees one question, so "and for females?" after
+"Which class performs best?" used to be answered on its own. A
+Conversation resolves each new question against the previous turn. A
+follow-up is a question that opens with "and", "what about" and the
+like, or a short one with no topic of its own that names a course,
+class or gender, a threshold, a top-k count or a superlative
+("females?", "above 90?", "the worst?"). Anything else, "Thanks!" and
+"Why is Biology doing poorly?" included, is a new question. A follow-up
+inherits the earlier intents and topics, and its own threshold, count
+and superlative replace the earlier ones. The courses, classes and
+genders it names narrow the filters, unless they replace one the
+previous question was about. The result is answered
+and charted like the standalone question it stands for:
+"Which class performs best? (and for females?)" under gender F.
+
+Earlier turns are kept as one-line digests: the resolved question, its
+filters and the first sentence of the answer. They are capped at
+HISTORY_TOKEN_BUDGET tokens. As new turns arrive, the oldest digests
+are folded into a single count line, so prompts stay the same size
+however long the chat runs. Each turn adds one digest and never
+re-reads the transcript. Only follow-up prompts carry the digests, and
+their answers skip the response cache: they depend on more than the
+question text and filters the cache is keyed on.
+"""
+import os
+import re
+from collections import Counter
+from dataclasses import replace
+
+from cube import FILTER_KEYS
+from intents import tokenize
+from prompt_builder import count_tokens
+
+HISTORY_TOKEN_BUDGET = int(os.getenv("PROMPT_HISTORY_TOKENS", 120))
+TURN_TOKENS = 40   # cap on one turn's digest
+
+FOLLOW_UP_OPENERS = [
+    ("and",), ("also",), ("but",), ("only",), ("same",), ("now",), ("then",),
+    ("what", "about"), ("how", "about"), ("what", "if"), ("why", "is", "that"), ("why", "so"),
+]
+# Longer questions without an opener are complete in themselves
+FOLLOW_UP_MAX_TOKENS = 4
+
+# Entity dimension -> filter key, which is also the topic it implies
+FILTER_FOR = {dim: key for key, dim in FILTER_KEYS.items()}
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def answer_gist(answer, max_tokens=TURN_TOKENS):
+    """First sentence of a markdown answer as plain text, cut to max_tokens"""
+    lines = [line.strip(" -*>|") for line in answer.splitlines()]
+    text = " ".join(line for line in lines if line and not line.startswith("#"))
+    text = _SENTENCE_END.split(text.replace("**", ""), maxsplit=1)[0]
+    words = text.split()
+    while len(words) > 1 and count_tokens(" ".join(words)) > max_tokens:
+        words = words[:-1]
+    gist = " ".join(words)
+    return gist if gist == text else gist + " …"
+
+
+def _describe(filters):
+    return "; ".join(f"{key} {'/'.join(map(str, levels))}" for key, levels in filters.items() if levels)
+
+
+class Conversation:
+    """The previous turn plus a token-budgeted digest of the ones before it"""
+
+    def __init__(self, budget=HISTORY_TOKEN_BUDGET):
+        self.budget = budget
+        self.turns = []            # (digest, topics), oldest first
+        self.earlier = 0           # turns folded out of self.turns
+        self.earlier_topics = Counter()
+        self.last = None           # resolved Route of the last answered question
+        self.base = None           # last standalone question
+        self.narrowed = {}         # filters follow-ups have added since then
+        self._pending = None
+
+    @classmethod
+    def from_messages(cls, messages, router, budget=HISTORY_TOKEN_BUDGET):
+        """Rebuild from a [{"role", "content"}, ...] transcript, e.g. one sent by an API client"""
+        conversation = cls(budget)
+        question = None
+        for message in messages:
+            if message.get("role") == "user":
+                question = message.get("content", "")
+            elif question is not None:
+                conversation.resolve(router.classify(question))
+                conversation.record(message.get("content", ""))
+                question = None
+        return conversation
+
+    def __len__(self):
+        return self.earlier + len(self.turns)
+
+    def is_follow_up(self, route):
+        """True if route's question leans on the previous turn"""
+        if self.last is None:
+            return False
+        tokens = tuple(tokenize(route.question))
+        if any(tokens[:len(opener)] == opener for opener in FOLLOW_UP_OPENERS):
+            return True
+        own_topics = route.topics - {FILTER_FOR[dim] for dim in route.entities}
+        names_something = (route.entities or route.comparison or route.top_k
+                           or route.best is not None)
+        return len(tokens) <= FOLLOW_UP_MAX_TOKENS and not own_topics and bool(names_something)
+
+    def resolve(self, route, filters=None):
+        """(route, filters) to answer route's question with, given the earlier turns
+
+        filters are the caller's (e.g. the sidebar's); filters added by
+        follow-ups take precedence over them for the same key.
+        """
+        filters = dict(filters or {})
+        if not self.is_follow_up(route):
+            self._pending = (route, filters, route.question, {})
+            return route, filters
+
+        previous = self.last
+        narrowed = dict(self.narrowed)
+        entities = dict(previous.entities)
+        for dim, levels in route.entities.items():
+            if dim in entities:
+                entities[dim] = levels
+            else:
+                narrowed[FILTER_FOR[dim]] = list(levels)
+        own_topics = route.topics - {FILTER_FOR[dim] for dim in route.entities}
+
+        resolved = replace(
+            route,
+            question=f"{self.base} ({route.question})",
+            intents=route.intents or previous.intents,
+            topics=own_topics or previous.topics,
+            entities=entities,
+            matches=previous.matches + route.matches,
+            confidence=max(previous.confidence, route.confidence),
+            # A follow-up's own numbers win: "and above 90?", "what about the top 10?", "and the worst?"
+            comparison=route.comparison or previous.comparison,
+            on_score=route.on_score or previous.on_score,
+            top_k=route.top_k or previous.top_k,
+            best=previous.best if route.best is None else route.best,
+        )
+        filters.update(narrowed)
+        self._pending = (resolved, filters, self.base, narrowed)
+        return resolved, filters
+
+    def record(self, answer):
+        """Fold the question resolve() last returned and its answer into the history"""
+        if self._pending is None:
+            return
+        route, filters, self.base, self.narrowed = self._pending
+        self._pending = None
+        self.last = route
+
+        digest = f'- "{route.question}"'
+        if _describe(filters):
+            digest += f" [{_describe(filters)}]"
+        self.turns.append((f"{digest}: {answer_gist(answer)}", route.topics))
+        # Oldest digests give way first; the latest turn always stays
+        while len(self.turns) > 1 and count_tokens("\n".join(self.context())) > self.budget:
+            _, topics = self.turns.pop(0)
+            self.earlier += 1
+            self.earlier_topics.update(topics)
+
+    def context(self):
+        """Prompt lines summarising the earlier turns (empty before the first answer)"""
+        if not self.turns:
+            return []
+        lines = ["EARLIER IN THIS CONVERSATION (oldest first):"]
+        if self.earlier:
+            topics = ", ".join(topic for topic, _ in self.earlier_topics.most_common(3))
+            lines.append(f"- {self.earlier} earlier questions" + (f" about {topics}" if topics else ""))
+        lines += [digest for digest, _ in self.turns]
+        return lines
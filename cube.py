@@ -0,0 +1,162 @@
+"""
+Precomputed aggregate cube over (course, class level, gender).
+
+Every cell stores the row count plus the sum and sum of squares of each
+engagement column, the cross-product sum of each column with the
+assessment score, and a bitmap of the students that appear in the cell.
+Any filter combination is answered by adding up the selected cells, so
+the cost depends on the number of cells rather than the number of rows.
+Appended rows are folded into the existing cells, growing the cube when
+they bring new levels or students, so refreshes never rescan old rows.
+
+The per-cell statistics live in one stacked ``moments`` array whose last
+axis is laid out as [count, sums..., sums of squares..., cross sums...];
+see the COUNT/SUMS/SUMSQ/CROSS slices below.
+"""
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+DIMENSIONS = ["course_name", "class_level", "student_gender"]
+
+# Keys used in st.session_state.filters
+FILTER_KEYS = {
+    "course": "course_name",
+    "class": "class_level",
+    "gender": "student_gender",
+}
+
+TARGET = "assessment_score"
+MEASURES = [
+    "assessment_score",
+    "attendance_rate",
+    "raised_hand_count",
+    "moodle_views",
+    "resources_downloads",
+]
+
+K = len(MEASURES)
+COUNT = 0
+SUMS = slice(1, 1 + K)
+SUMSQ = slice(1 + K, 1 + 2 * K)
+CROSS = slice(1 + 2 * K, 1 + 3 * K)
+N_MOMENTS = 1 + 3 * K
+
+
+class AggregateCube:
+    """Per-cell sufficient statistics, folded in one batch of rows at a time"""
+
+    def __init__(self, df):
+        self.levels = {dim: [] for dim in DIMENSIONS}
+        self.shape = (0,) * len(DIMENSIONS)
+        self.moments = np.zeros(self.shape + (N_MOMENTS,))
+        self.students = pd.Index([])
+        self.student_bitmap = np.zeros(self.shape + (0,), dtype=bool)
+        self.append(df)
+
+    def _codes(self, values, known):
+        """Codes of values against the known levels, extending them with unseen ones"""
+        index = pd.Index(known)
+        unseen = pd.unique(values[index.get_indexer(values) < 0])
+        if len(unseen):
+            index = index.append(pd.Index(unseen))
+        return index.get_indexer(values), index
+
+    def _grow(self, shape, n_students):
+        """Zero-pad the arrays so new levels or students get empty cells"""
+        if shape != self.shape:
+            moments = np.zeros(shape + (N_MOMENTS,))
+            moments[tuple(slice(0, n) for n in self.shape)] = self.moments
+            self.moments = moments
+        if shape != self.shape or n_students != self.student_bitmap.shape[-1]:
+            bitmap = np.zeros(shape + (n_students,), dtype=bool)
+            bitmap[tuple(slice(0, n) for n in self.student_bitmap.shape)] = self.student_bitmap
+            self.student_bitmap = bitmap
+        self.shape = shape
+
+    def _locate(self, frame):
+        """Per-dimension codes of each row of frame, extending the known levels"""
+        codes = []
+        for dim in DIMENSIONS:
+            dim_codes, index = self._codes(frame[dim].to_numpy(), self.levels[dim])
+            self.levels[dim] = list(index)
+            codes.append(dim_codes)
+        return codes
+
+    def append(self, df):
+        """Add new rows to the cube in place; cost depends only on len(df)"""
+        codes = self._locate(df)
+        student_codes, self.students = self._codes(df["student_id"].to_numpy(), self.students)
+
+        self._grow(tuple(len(self.levels[dim]) for dim in DIMENSIONS), len(self.students))
+        n_cells = int(np.prod(self.shape))
+        if len(df) == 0:
+            return
+        cell = np.ravel_multi_index(codes, self.shape)
+
+        values = df[MEASURES].to_numpy(dtype=np.float64)
+        target = values[:, MEASURES.index(TARGET)]
+        terms = np.column_stack([values, values * values, values * target[:, None]])
+
+        moments = self.moments.reshape(n_cells, N_MOMENTS)
+        moments[:, COUNT] += np.bincount(cell, minlength=n_cells)
+        for j in range(terms.shape[1]):
+            moments[:, 1 + j] += np.bincount(cell, weights=terms[:, j], minlength=n_cells)
+
+        # Exact distinct-student sketch: one bit per (cell, student)
+        bitmap = self.student_bitmap.reshape(n_cells, len(self.students))
+        bitmap[cell, student_codes] = True
+
+    def add_cells(self, cells, moments, members):
+        """Add statistics aggregated elsewhere, e.g. pushed down to a database
+
+        cells holds the DIMENSIONS columns, one row per cell, aligned with
+        an (n, N_MOMENTS) moments array in the layout above; members holds
+        DIMENSIONS plus student_id, one row per distinct (cell, student).
+        """
+        cell_codes = self._locate(cells)
+        member_codes = self._locate(members)
+        student_codes, self.students = self._codes(members["student_id"].to_numpy(), self.students)
+
+        self._grow(tuple(len(self.levels[dim]) for dim in DIMENSIONS), len(self.students))
+        n_cells = int(np.prod(self.shape))
+        if len(cells):
+            flat = self.moments.reshape(n_cells, N_MOMENTS)
+            np.add.at(flat, np.ravel_multi_index(cell_codes, self.shape), moments)
+        if len(members):
+            bitmap = self.student_bitmap.reshape(n_cells, len(self.students))
+            bitmap[np.ravel_multi_index(member_codes, self.shape), student_codes] = True
+
+    def fingerprint(self):
+        """Short hash of the cube's contents, a dataset version for stores without a file hash"""
+        digest = hashlib.sha256(self.moments.tobytes())
+        digest.update(np.packbits(self.student_bitmap).tobytes())
+        digest.update(repr((self.levels, list(self.students))).encode())
+        return digest.hexdigest()[:16]
+
+    def select(self, filters=None):
+        """Return a CubeSlice for a st.session_state.filters style dict"""
+        filters = filters or {}
+        masks = []
+        for key, dim in FILTER_KEYS.items():
+            wanted = filters.get(key) or []
+            if wanted:
+                wanted = set(wanted)
+                masks.append(np.array([level in wanted for level in self.levels[dim]], dtype=bool))
+            else:
+                masks.append(np.ones(len(self.levels[dim]), dtype=bool))
+        return CubeSlice(self, masks)
+
+
+class CubeSlice:
+    """The cells of a cube selected by one filter combination"""
+
+    def __init__(self, cube, masks):
+        self.levels = {
+            dim: [level for level, keep in zip(cube.levels[dim], mask) if keep]
+            for dim, mask in zip(DIMENSIONS, masks)
+        }
+        index = np.ix_(*masks)
+        self.moments = cube.moments[index]
+        self.student_bitmap = cube.student_bitmap[index]
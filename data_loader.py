@@ -0,0 +1,222 @@
+"""
+Data loading layer.
+
+Parsing the Excel workbook through openpyxl is the slowest part of a cold
+start, so the first process to load it converts the sheet into a bundle of
+column-wise ``.npy`` files. Later starts (and other replicas sharing the
+cache directory) memory-map that bundle instead of re-parsing the workbook.
+
+Bundles are keyed by the source file's content hash; the file's mtime and
+size are kept next to the hash so an unchanged file is never re-hashed.
+The workbook is validated and narrowed to the compact dtypes in schema.py
+before its bundle is written.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from schema import apply_schema
+
+CACHE_DIR = os.getenv("DATA_CACHE_DIR", ".data_cache")
+BUNDLE_FORMAT = 2
+
+
+# ==================================================
+# SOURCE FINGERPRINT
+# ==================================================
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_fingerprint(path, cache_dir=CACHE_DIR):
+    """Return (mtime_ns, size, sha256) for the source file.
+
+    The hash is remembered in a small stamp file and only recomputed when
+    the file's mtime or size change.
+    """
+    stat = os.stat(path)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    stamp_path = os.path.join(cache_dir, f"{stem}.stamp.json")
+
+    try:
+        with open(stamp_path) as f:
+            stamp = json.load(f)
+        if stamp["mtime_ns"] == stat.st_mtime_ns and stamp["size"] == stat.st_size:
+            return stat.st_mtime_ns, stat.st_size, stamp["sha256"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    sha = _sha256(path)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(stamp_path, "w") as f:
+            json.dump({"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": sha}, f)
+    except OSError:
+        pass
+    return stat.st_mtime_ns, stat.st_size, sha
+
+
+def dataset_version(path, cache_dir=CACHE_DIR):
+    """Short content hash of the source file, used to key derived caches"""
+    return file_fingerprint(path, cache_dir)[2][:16]
+
+
+def appended_version(version, rows):
+    """Version of a dataset at version after rows were appended to it"""
+    digest = hashlib.sha256(version.encode())
+    digest.update(pd.util.hash_pandas_object(rows, index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+# ==================================================
+# READ-ONLY FRAMES
+# ==================================================
+def _read_only(values):
+    view = values.view()
+    view.flags.writeable = False
+    return view
+
+
+class FrozenFrame(pd.DataFrame):
+    """DataFrame whose columns cannot be added, replaced, renamed or dropped in place
+
+    Selections, copies and results computed from it are plain DataFrames.
+    """
+
+    @property
+    def _constructor(self):
+        return pd.DataFrame
+
+    def _read_only_frame(self, *args, **kwargs):
+        raise ValueError("the shared dataset is read-only; work on a .copy()")
+
+    __setitem__ = __delitem__ = insert = pop = _update_inplace = _read_only_frame
+
+    def __setattr__(self, name, value):
+        if name in ("columns", "index") or (not name.startswith("_") and name in self.columns):
+            self._read_only_frame()
+        super().__setattr__(name, value)
+
+
+def freeze(df):
+    """The same frame backed by read-only arrays, without copying any column
+
+    The dataset is shared by every session, so an accidental in-place
+    write must raise instead of silently changing what other sessions
+    see: cell writes (df.loc[...] = ..., df[col].to_numpy()[i] = ...)
+    hit read-only arrays, and column changes (df[col] = ..., del df[col],
+    df.rename(..., inplace=True)) are refused by FrozenFrame.
+    """
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            codes = _read_only(series.cat.codes.to_numpy())
+            columns[col] = pd.Categorical.from_codes(codes, dtype=series.dtype)
+        elif isinstance(series.dtype, np.dtype):
+            columns[col] = _read_only(series.to_numpy())
+        else:
+            columns[col] = series.array
+    return FrozenFrame(columns, copy=False)
+
+
+# ==================================================
+# COLUMN BUNDLE
+# ==================================================
+def _bundle_dir(path, sha, cache_dir):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, f"{stem}-{sha[:16]}")
+
+
+def _write_bundle(df, bundle_dir):
+    """Write every column as its own .npy file; categorical and text columns as codes"""
+    parent = os.path.dirname(bundle_dir) or "."
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix=".tmp-")
+
+    try:
+        columns = []
+        for i, col in enumerate(df.columns):
+            series = df[col]
+            entry = {"name": col, "file": f"c{i}.npy", "dtype": str(series.dtype)}
+
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                values = series.cat.codes.to_numpy()
+                entry["categories"] = series.cat.categories.tolist()
+            elif series.dtype.kind in "biufcmM":
+                values = series.to_numpy()
+            else:
+                codes, uniques = pd.factorize(series)
+                values = codes.astype(np.int32)
+                entry["categories"] = uniques.tolist()
+
+            np.save(os.path.join(tmp_dir, entry["file"]), values, allow_pickle=False)
+            columns.append(entry)
+
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+            json.dump({"format": BUNDLE_FORMAT, "rows": len(df), "columns": columns}, f)
+
+        # Atomic publish so concurrent replicas never see a half-written bundle
+        os.replace(tmp_dir, bundle_dir)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+def _read_bundle(bundle_dir):
+    """Memory-map a bundle written by _write_bundle"""
+    with open(os.path.join(bundle_dir, "meta.json")) as f:
+        meta = json.load(f)
+    if meta.get("format") != BUNDLE_FORMAT:
+        raise ValueError("unsupported bundle format")
+
+    data = {}
+    for entry in meta["columns"]:
+        values = np.load(os.path.join(bundle_dir, entry["file"]), mmap_mode="r")
+        if "categories" in entry:
+            categorical = pd.Categorical.from_codes(values, categories=entry["categories"])
+            data[entry["name"]] = pd.Series(categorical).astype(entry["dtype"])
+        else:
+            data[entry["name"]] = values
+    return pd.DataFrame(data, copy=False)
+
+
+def _prune_stale(path, keep, cache_dir):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    try:
+        for name in os.listdir(cache_dir):
+            full = os.path.join(cache_dir, name)
+            if name.startswith(f"{stem}-") and full != keep and os.path.isdir(full):
+                shutil.rmtree(full, ignore_errors=True)
+    except OSError:
+        pass
+
+
+def load_dataset(path, cache_dir=CACHE_DIR):
+    """Load the workbook, converting it to a cached column bundle on first use"""
+    _, _, sha = file_fingerprint(path, cache_dir)
+    bundle_dir = _bundle_dir(path, sha, cache_dir)
+
+    if os.path.isdir(bundle_dir):
+        try:
+            return _read_bundle(bundle_dir)
+        except (OSError, ValueError, KeyError):
+            shutil.rmtree(bundle_dir, ignore_errors=True)
+
+    df = apply_schema(pd.read_excel(path))
+    try:
+        _write_bundle(df, bundle_dir)
+        _prune_stale(path, bundle_dir, cache_dir)
+    except (OSError, TypeError, ValueError):
+        # Read-only or full disk: serve the parsed frame uncached
+        pass
+    return df
@@ -0,0 +1,486 @@
+"""
+Question-answering engine, independent of the Streamlit UI.
+
+Engine owns everything smart_answer needs: the dataset with its cube,
+per-student feature table (see students.py), filter index and intent
+router, the summary memo, the response cache, the completion backend
+(see llm_backends.py) and the worker pool. The Streamlit app keeps one
+Engine per process; batch runs and other services build their own with
+Engine.from_env, which picks the in-memory dataset or, with
+DATA_BACKEND=sqlite, the out-of-core store (see store.py).
+
+Engine.refresh merges rows appended to the watched sources (see
+refresh.py) without reloading: the cube folds in just the new rows and
+the dataset version moves on, so summaries and cached answers for the
+old data are simply never looked up again. Callbacks in on_update run
+after every such change (the warm-up in warmup.py hooks in there).
+
+smart_answer takes an optional Conversation (see conversation.py) that
+turns follow-ups into standalone questions and filters and adds a
+budgeted digest of earlier turns to the prompt.
+
+Every stage timing in meta["stages"], plus data loads, refreshes, time
+to first token, total answer time and LLM tokens per second, is also
+fed to the process-wide METRICS registry (see metrics.py);
+Engine.counters adds the answer-path and cache counts it exports with.
+"""
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from charts import create_visualization
+from cube import COUNT, AggregateCube
+from data_loader import appended_version, dataset_version, freeze, load_dataset
+from filter_index import FilterIndex, canonical_filters, narrow_filters
+from intents import IntentRouter
+from llm_backends import make_client
+from local_answers import AnswerPaths, answer_locally
+from memo import LRUCache
+from metrics import METRICS
+from prompt_builder import CONTEXT_FORMAT_VERSION, assemble_context, count_tokens
+from refresh import SourceRewritten, conform, default_sources, positions, restore_positions
+from response_cache import ResponseCache
+from schema import concat_rows
+from stats import summarize
+from students import StudentFeatures
+from store import BACKEND, STORE_PATH, SQLiteStore
+
+DATA_PATH = "Students_Dataset.xlsx"
+
+log = logging.getLogger(__name__)
+
+# ==================================================
+# PROMPT TEMPLATES
+# ==================================================
+MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+
+BIG_QUESTION_PROMPT = """{context}
+
+This is a BIG question - provide a DETAILED, INSIGHTFUL response like ChatGPT would.
+
+STYLE:
+- Start with ### and emoji
+- Use **bold** for emphasis
+- Break into SHORT sections with subheadings
+- Use bullet points for lists
+- 2-3 sentences per paragraph MAX
+- Focus on INSIGHTS, not just numbers
+- Be conversational and engaging
+
+STRUCTURE:
+### [Title]
+
+Brief intro (1-2 sentences)
+
+**Section 1:**
+- Point with data
+- Point with data
+
+**Section 2:**
+- Insight
+- Insight
+
+Final takeaway or recommendation.
+
+NOW ANSWER: "{question}"
+"""
+
+SIMPLE_QUESTION_PROMPT = """{context}
+
+This is a SIMPLE question - provide a SHORT, DIRECT response like ChatGPT would.
+
+STYLE:
+- Start with ### and emoji
+- 2-4 sentences total
+- Use **bold** for key numbers
+- Conversational tone
+- Answer the EXACT question
+
+EXAMPLE:
+
+Q: "Compare Biology vs Computer"
+A: ### 📊 Biology vs Computer
+
+Computer students score **70.3** on average, while Biology students score **70.0**. Computer edges ahead by just 0.3 points - they're basically tied! Both perform right around the overall average.
+
+NOW ANSWER: "{question}"
+"""
+
+# Cached answers are only reused while the model, templates and context format are unchanged
+PROMPT_TEMPLATE_ID = hashlib.sha256(
+    (MODEL + BIG_QUESTION_PROMPT + SIMPLE_QUESTION_PROMPT + CONTEXT_FORMAT_VERSION).encode()
+).hexdigest()[:16]
+
+
+# ==================================================
+# HELPERS
+# ==================================================
+def stream_tokens(deltas, meta, start_time, llm_start, on_complete):
+    """Yield answer tokens as they arrive, recording time-to-first-token"""
+    parts = []
+    try:
+        for delta in deltas:
+            if "ttft" not in meta:
+                meta["ttft"] = (datetime.now() - start_time).total_seconds()
+                METRICS.observe("ttft", meta["ttft"])
+            parts.append(delta)
+            yield delta
+    except Exception as e:
+        yield f"\n\n❌ Error: {str(e)}"
+        meta["error"] = True
+        parts = []
+
+    answer = "".join(parts).strip()
+    record_llm(meta["stages"], (datetime.now() - llm_start).total_seconds(), answer)
+    meta["time"] = (datetime.now() - start_time).total_seconds()
+    METRICS.observe("answer", meta["time"])
+    if answer:
+        on_complete(answer)
+
+
+def timed(stages, name, func, *args):
+    """Run func(*args), recording its duration in stages[name] and METRICS"""
+    stage_start = datetime.now()
+    try:
+        return func(*args)
+    finally:
+        stages[name] = (datetime.now() - stage_start).total_seconds()
+        METRICS.observe(name, stages[name])
+
+
+def record_llm(stages, seconds, answer, completion_tokens=None):
+    """Record an LLM call's duration and, for a non-empty answer, its tokens per second"""
+    stages["llm"] = seconds
+    METRICS.observe("llm", seconds)
+    if answer and seconds > 0:
+        METRICS.observe_rate("llm_tokens_per_second", (completion_tokens or count_tokens(answer)) / seconds)
+
+
+def resolved(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+# ==================================================
+# ENGINE
+# ==================================================
+class Engine:
+    """Dataset, indexes, caches and LLM client behind smart_answer"""
+
+    def __init__(self, df, version, client=None, response_cache=None, executor=None,
+                 path=None, sources=(), store=None):
+        """Pass df=None and a store to keep the dataset out of core"""
+        self.path = path
+        self.store = store
+        self.sources = list(sources)
+        if store is not None:
+            # The store already holds what the sources delivered before; resume after it
+            restore_positions(self.sources, store.source_positions())
+        self.last_refresh = time.monotonic()
+        self._refresh_lock = threading.Lock()
+        self.on_update = []
+        self.filter_usage = Counter()
+        self._usage_lock = threading.Lock()
+        if store is None:
+            self._set_data(df, AggregateCube(df), StudentFeatures(df), version)
+        else:
+            cube = store.build_cube()
+            self._set_data(None, cube, store.build_students(), version or cube.fingerprint())
+        self.summary_cache = LRUCache(max_entries=int(os.getenv("SUMMARY_CACHE_SIZE", 256)))
+        self.student_cache = LRUCache(max_entries=int(os.getenv("SUMMARY_CACHE_SIZE", 256)))
+        self.answer_paths = AnswerPaths()
+
+        self.client = client or make_client()
+        # Answers are cached per backend, so offline answers never outlive a switch to a real model
+        self.template_id = f"{PROMPT_TEMPLATE_ID}-{self.client.name}"
+        if response_cache is None:
+            # Near-duplicate matching costs an embedding call per miss, so it is opt-in
+            semantic = os.getenv("RESPONSE_CACHE_SEMANTIC", "").lower() in ("1", "true", "yes")
+            response_cache = ResponseCache(embed=self.client.embed if semantic else None)
+        self.response_cache = response_cache
+        # Charts are built here while the LLM call is in flight
+        self.executor = executor or ThreadPoolExecutor(max_workers=8, thread_name_prefix="smart-answer")
+
+    @classmethod
+    def from_path(cls, path=DATA_PATH, **kwargs):
+        """Engine over the dataset at path (parsed once, then memory-mapped)"""
+        with METRICS.span("data_load"):
+            df = load_dataset(path)
+        kwargs.setdefault("sources", default_sources(path, len(df)))
+        return cls(df, dataset_version(path), path=path, **kwargs)
+
+    @classmethod
+    def from_store(cls, path=STORE_PATH, **kwargs):
+        """Engine over an out-of-core SQLite store; only aggregates are held in memory"""
+        kwargs.setdefault("sources", default_sources(None, 0))
+        with METRICS.span("data_load"):
+            return cls(None, None, store=SQLiteStore(path), **kwargs)
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        """Engine for the backend named by DATA_BACKEND ("memory" or "sqlite")"""
+        if BACKEND == "sqlite":
+            return cls.from_store(**kwargs)
+        return cls.from_path(**kwargs)
+
+    @property
+    def records(self):
+        return int(self.cube.moments[..., COUNT].sum())
+
+    def counters(self):
+        """Answer-path, cache and LLM queue counts in to_prometheus's counters format"""
+        summaries, students = self.summary_cache.stats(), self.student_cache.stats()
+        return {
+            "answers_total": ("path", self.answer_paths.snapshot()),
+            "cache_hits_total": ("cache", {"summary": summaries["hits"], "students": students["hits"],
+                                           "response": self.response_cache.hits}),
+            "cache_misses_total": ("cache", {"summary": summaries["misses"], "students": students["misses"],
+                                             "response": self.response_cache.misses}),
+            "cache_entries": ("cache", {"summary": summaries["size"], "students": students["size"]}),
+            "llm_requests": ("state", {"in_flight": self.client.in_flight, "waiting": self.client.waiting}),
+            "dataset_records": ("backend", {"sqlite" if self.store else "memory": self.records}),
+        }
+
+    @property
+    def columns(self):
+        return list(self.df.columns) if self.store is None else self.store.columns
+
+    def _set_data(self, df, cube, students, version):
+        if self.store is None:
+            # One read-only frame shared by every session; in-place writes raise
+            df = freeze(df)
+            # Sidebar filters resolve to row positions instead of frame copies
+            self.filter_index = FilterIndex(df)
+        else:
+            # Filters become WHERE clauses against the store
+            self.filter_index = self.store
+        self.df = df
+        self.cube = cube
+        self.students = students
+        # Keyword groups plus course/class names from the data, compiled once
+        self.router = IntentRouter(levels=cube.levels)
+        # Set last: a summary is never cached under the new version from old data
+        self.version = version
+
+    def append(self, rows):
+        """Merge new rows into the dataset, cube and indexes and bump the version"""
+        rows = conform(rows, self.columns)
+        # Sessions may be reading the current cube, so fold into a copy
+        cube = copy.deepcopy(self.cube)
+        cube.append(rows)
+        # add_cells replaces the cell frames rather than writing into them, so a shallow copy will do
+        students = copy.copy(self.students)
+        students.append(rows)
+        if self.store is None:
+            df = concat_rows(self.df, rows)
+        else:
+            df = None
+            self.store.append(rows, positions(self.sources))
+        self._set_data(df, cube, students, appended_version(self.version, rows))
+        self._updated()
+        return len(rows)
+
+    def _updated(self):
+        for callback in self.on_update:
+            callback()
+
+    def refresh(self, min_interval=0):
+        """Poll the watched sources and merge new rows; returns how many were added
+
+        Polls more often than min_interval seconds apart are skipped. A
+        source that was rewritten rather than appended to triggers a full
+        reload from path. Rows that fail validation are logged and left for
+        their source to offer again (see refresh.py), and a failed merge
+        moves every source back to where it was.
+        """
+        with self._refresh_lock:
+            if time.monotonic() - self.last_refresh < min_interval:
+                return 0
+            self.last_refresh = time.monotonic()
+            saved = positions(self.sources)
+            try:
+                with METRICS.span("refresh"):
+                    frames = []
+                    for source in self.sources:
+                        try:
+                            rows = source.poll(lambda rows: conform(rows, self.columns))
+                        except ValueError as e:
+                            # The source stays put, so the rows are offered again once fixed
+                            log.warning("skipped new rows from %s: %s", source.key, e)
+                            continue
+                        if rows is not None and len(rows):
+                            frames.append(rows)
+            except SourceRewritten:
+                with METRICS.span("data_load"):
+                    df = load_dataset(self.path)
+                    self._set_data(df, AggregateCube(df), StudentFeatures(df), dataset_version(self.path))
+                self.sources = default_sources(self.path, len(df))
+                self._updated()
+                return len(df)
+            if not frames:
+                return 0
+            try:
+                with METRICS.span("refresh"):
+                    return self.append(pd.concat(frames, ignore_index=True))
+            except Exception:
+                # Nothing was merged, so the next poll must offer these rows again
+                restore_positions(self.sources, saved)
+                raise
+
+    def select(self, filters=None):
+        return self.filter_index.select(filters)
+
+    def top_filters(self, n):
+        """The n filter combinations sessions have asked under most, excluding no filters"""
+        with self._usage_lock:
+            common = self.filter_usage.most_common(n + 1)
+        return [json.loads(key) for key, _ in common if key != canonical_filters(None)][:n]
+
+    def summary(self, filters=None):
+        """Memoized Summary for a filters dict under the current dataset version"""
+        key = (canonical_filters(filters), self.version)
+        return self.summary_cache.get_or_compute(key, lambda: summarize(self.cube.select(filters)))
+
+    def student_table(self, filters=None):
+        """Memoized StudentTable for a filters dict under the current dataset version"""
+        key = (canonical_filters(filters), self.version)
+        return self.student_cache.get_or_compute(key, lambda: self.students.table(filters))
+
+    def build_prompt(self, question, summary, route=None, students=None, history=()):
+        """Pick the prompt template and fill it with stats relevant to the question"""
+        route = route or self.router.classify(question)
+
+        # Determine if this is a "big" question needing detailed response
+        is_big_question = route.has('overview')
+
+        # Relevant stat blocks, packed into the context token budget
+        context, context_tokens = assemble_context(question, summary, route, students=students,
+                                                   history=history)
+
+        # Different prompts for big vs small questions
+        template = BIG_QUESTION_PROMPT if is_big_question else SIMPLE_QUESTION_PROMPT
+        prompt = template.format(context=context, question=question)
+        return prompt, is_big_question, context_tokens
+
+    def smart_answer(self, question, filters=None, stream=False, record=True, conversation=None):
+        """ChatGPT-style responses - conversational, structured, insightful
+
+        Returns (answer, chart, meta) where chart is a chart spec and meta
+        holds the response time, per-stage timings and which path served
+        the answer: "local" for numeric questions answered from the data,
+        "cache" for response-cache hits and "llm" otherwise. meta["error"]
+        is set when the LLM call failed. The chart is built on the worker
+        pool while the prompt is assembled and the LLM call is in flight.
+
+        With stream=True the answer is an iterator of text chunks (render it
+        with st.write_stream) and the chart is a Future to resolve after the
+        text has been drawn; meta["time"] and meta["ttft"] are filled in as
+        the stream is consumed.
+
+        record=False keeps the question out of the answer-path and filter
+        usage tallies, for answers nobody asked for yet (see warmup.py).
+
+        With a Conversation, a follow-up is answered as the standalone
+        question and filters it resolves to (meta["resolved_question"]
+        holds that question) and the prompt carries the conversation's
+        digest of earlier turns. Such answers depend on that digest, so
+        they are neither looked up in nor added to the response cache.
+        Call conversation.record(answer) once the answer is complete.
+        """
+        start_time = datetime.now()
+        stages = {}
+        route = self.router.classify(question)
+        resolution, history = {}, ()
+        if conversation is not None:
+            route, filters = conversation.resolve(route, filters)
+            if route.question != question:
+                question = route.question
+                resolution = {"resolved_question": question}
+                history = conversation.context()
+        if record:
+            with self._usage_lock:
+                self.filter_usage[canonical_filters(filters)] += 1
+        selection = timed(stages, "filter", self.select, filters)
+        summary = timed(stages, "summary", self.summary, filters)
+        chart = self.executor.submit(timed, stages, "chart", create_visualization, route, selection, summary)
+        # Student-level features only for questions about students or the whole picture,
+        # restricted to any course, class or gender the question names
+        students = None
+        student_filters = narrow_filters(filters, route.entities)
+        if route.has("students", "overview") and student_filters is not None:
+            students = timed(stages, "students", self.student_table, student_filters)
+
+        # Exact numeric questions never need the LLM; then try the response cache
+        path = "local"
+        known_answer = timed(stages, "local", answer_locally, route, selection, summary, students)
+        if known_answer is None and not history:
+            path = "cache"
+            known_answer = self.response_cache.get(question, filters, self.version, self.template_id)
+
+        if known_answer is not None:
+            if record:
+                self.answer_paths.record(path)
+            meta = {"time": 0, "cached": path == "cache", "path": path, "stages": stages, **resolution}
+            if stream:
+                meta["time"] = (datetime.now() - start_time).total_seconds()
+                METRICS.observe("answer", meta["time"])
+                return iter([known_answer]), chart, meta
+            chart = chart.result()
+            meta["time"] = (datetime.now() - start_time).total_seconds()
+            METRICS.observe("answer", meta["time"])
+            return known_answer, chart, meta
+
+        if record:
+            self.answer_paths.record("llm")
+
+        prompt, is_big_question, context_tokens = timed(
+            stages, "context", self.build_prompt, question, summary, route, students, history
+        )
+
+        def remember(answer):
+            if not history:
+                self.response_cache.put(question, filters, self.version, self.template_id, answer)
+
+        try:
+            llm_start = datetime.now()
+            request = dict(
+                model=MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.15,
+                max_tokens=400 if is_big_question else 200
+            )
+
+            if stream:
+                deltas = self.client.stream(**request)
+                meta = {"time": 0, "cached": False, "path": "llm", "stages": stages,
+                        "context_tokens": context_tokens, **resolution}
+                return stream_tokens(deltas, meta, start_time, llm_start, remember), chart, meta
+
+            completion = self.client.complete(**request)
+            answer = completion.text.strip()
+            record_llm(stages, (datetime.now() - llm_start).total_seconds(), answer,
+                       completion.completion_tokens)
+            remember(answer)
+
+            # Join the visualization built alongside the LLM call
+            chart = chart.result()
+
+            elapsed = (datetime.now() - start_time).total_seconds()
+            METRICS.observe("answer", elapsed)
+            return answer, chart, {"time": elapsed, "cached": False, "path": "llm", "stages": stages,
+                                   "context_tokens": context_tokens, **resolution}
+
+        except Exception as e:
+            error = f"❌ Error: {str(e)}"
+            meta = {"time": 0, "cached": False, "path": "llm", "stages": stages, "error": True, **resolution}
+            return (iter([error]), resolved(None), meta) if stream else (error, None, meta)
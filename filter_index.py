@@ -0,0 +1,124 @@
+"""
+Filter engine for the sidebar filters.
+
+The filter columns are encoded once as category codes, and every level
+gets a packed bitmap of the rows that carry it. A filter combination is
+resolved by OR-ing the bitmaps of the wanted levels and AND-ing across
+columns, which yields row positions instead of a filtered copy of the
+frame. Columns are only gathered for the rows that are actually needed.
+"""
+import json
+
+import numpy as np
+import pandas as pd
+
+from cube import FILTER_KEYS
+
+
+def canonical_filters(filters):
+    """Stable JSON for a filters dict; empty selections are dropped"""
+    filters = filters or {}
+    return json.dumps(
+        {key: sorted(str(v) for v in values) for key, values in filters.items() if values},
+        sort_keys=True,
+    )
+
+
+def narrow_filters(filters, entities):
+    """filters further restricted to a Route's entities ({dim: levels})
+
+    Returns None when a named level is excluded by the filters already
+    set for its dimension, since nothing could then match.
+    """
+    narrowed = dict(filters or {})
+    for key, dim in FILTER_KEYS.items():
+        levels = entities.get(dim)
+        if not levels:
+            continue
+        current = {str(level) for level in narrowed.get(key) or []}
+        levels = [level for level in levels if str(level) in current] if current else list(levels)
+        if not levels:
+            return None
+        narrowed[key] = levels
+    return narrowed
+
+
+class FilterIndex:
+    """Category codes and per-level row bitmaps for the filter columns"""
+
+    def __init__(self, df):
+        self.df = df
+        self.n_rows = len(df)
+        self.codes = {}
+        self.bitmaps = {}
+        for dim in FILTER_KEYS.values():
+            codes, uniques = pd.factorize(df[dim], sort=False)
+            self.codes[dim] = codes
+            self.bitmaps[dim] = {
+                level: np.packbits(codes == i) for i, level in enumerate(uniques)
+            }
+
+    def select(self, filters=None):
+        """Resolve a st.session_state.filters style dict to a RowSelection"""
+        filters = filters or {}
+        combined = None
+        for key, dim in FILTER_KEYS.items():
+            wanted = filters.get(key) or []
+            if not wanted:
+                continue
+            bitmaps = self.bitmaps[dim]
+            column = np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+            for level in wanted:
+                if level in bitmaps:
+                    column |= bitmaps[level]
+            combined = column if combined is None else combined & column
+
+        if combined is None:
+            return RowSelection(self.df, None)
+        mask = np.unpackbits(combined, count=self.n_rows).view(bool)
+        return RowSelection(self.df, np.flatnonzero(mask))
+
+
+class RowSelection:
+    """Lazy view of the selected rows; rows=None means every row"""
+
+    def __init__(self, df, rows):
+        self.df = df
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.df) if self.rows is None else len(self.rows)
+
+    @property
+    def is_full(self):
+        return self.rows is None
+
+    def column(self, name):
+        """NumPy values of one column for the selected rows"""
+        values = self.df[name].to_numpy()
+        return values if self.rows is None else values[self.rows]
+
+    def frame(self, columns=None):
+        """Materialize the selected rows, restricted to columns if given"""
+        df = self.df if columns is None else self.df[columns]
+        return df if self.rows is None else df.take(self.rows)
+
+    # The methods below are all the engine uses, so an out-of-core store
+    # can answer them with queries instead (see store.SQLSelection)
+
+    def sample(self, columns, n, seed=0):
+        """Float arrays of columns for at most n selected rows, drawn deterministically"""
+        keep = slice(None)
+        if len(self) > n:
+            keep = np.sort(np.random.default_rng(seed).choice(len(self), n, replace=False))
+        return {col: self.column(col)[keep].astype(float) for col in columns}
+
+    def student_means(self, column):
+        """Mean of column per selected student"""
+        values = self.column(column).astype(float)
+        codes, _ = pd.factorize(self.column("student_id"))
+        return np.bincount(codes, weights=values) / np.bincount(codes)
+
+    def count_where(self, column, op, value):
+        """Number of selected rows with op(column, value), op from the operator module"""
+        return int(op(self.column(column).astype(float), value).sum())
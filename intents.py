@@ -0,0 +1,209 @@
+"""
+Intent router.
+
+All keyword groups used to pick charts and prompt context are compiled
+once into a phrase index keyed by first token. A question is tokenized
+and classified in one left-to-right pass, yielding every matched intent,
+topic and filter entity together with a confidence score.
+
+Matching is on whole tokens, so short keywords such as "m", "f" or "vs"
+no longer fire inside unrelated words the way substring checks did.
+
+The numbers a question carries are parsed here too: a single
+"<comparator> N" condition (and whether it follows a score word), a
+top-k count and the first superlative. Answer plans read them from the
+Route, so a follow-up resolved against an earlier question (see
+conversation.py) keeps its own values.
+"""
+import operator
+import re
+from dataclasses import dataclass
+
+# Question types
+INTENTS = {
+    "compare": [
+        "compare", "compared", "comparison", "vs", "versus", "between", "difference",
+        "better", "best", "worst", "top", "highest", "lowest",
+    ],
+    "distribution": ["distribution", "breakdown", "percentage", "how many", "split", "divide"],
+    "correlation": [
+        "correlation", "relationship", "affect", "affects", "affected", "impact",
+        "influence", "influences", "relate", "related", "connection", "correlate",
+        "correlates", "correlated",
+    ],
+    "average": ["average", "mean"],
+    "overview": [
+        "everything", "all", "overview", "summary", "interesting", "insight",
+        "tell me about", "what should", "recommendation",
+    ],
+}
+
+# What the question is about
+TOPICS = {
+    "course": ["course", "subject", "math"],
+    "gender": ["gender", "male", "female", "boy", "girl", "men", "women", "m", "f"],
+    "class": ["class", "classes", "level"],
+    "attendance": ["attendance", "attend", "absence"],
+    "participation": ["hand", "participation", "raise", "raised"],
+    "moodle": ["moodle"],
+    "downloads": ["download", "resource"],
+    "students": ["student", "pupil", "learner", "at risk", "struggling", "failing"],
+}
+
+# Words that name a gender filter value
+GENDER_WORDS = {
+    "M": ["male", "boy", "men", "m"],
+    "F": ["female", "girl", "women", "f"],
+}
+
+# Comparator phrases -> (operator, label); longer phrases are listed first
+COMPARATORS = [
+    (["at least", "or more than", "no less than"], operator.ge, "at least"),
+    (["at most", "no more than"], operator.le, "at most"),
+    (["above", "over", "more than", "greater than", "higher than", "exceeding"], operator.gt, "above"),
+    (["below", "under", "less than", "lower than", "fewer than"], operator.lt, "below"),
+]
+COMPARISON_WORDS = {phrase: (op, label) for phrases, op, label in COMPARATORS for phrase in phrases}
+SCORE_WORDS = ["score", "scores", "scored", "scoring", "grade", "grades", "graded", "mark", "marks"]
+SUPERLATIVES = {"best": True, "top": True, "highest": True, "worst": False, "lowest": False}
+
+TOKEN_RE = re.compile(r"[a-z0-9']+")
+NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+_COMPARATOR = "|".join(COMPARISON_WORDS)
+COMPARATOR_RE = re.compile(rf"\b(?:{_COMPARATOR})\b")
+COMPARISON_RE = re.compile(
+    rf"\b(?:({'|'.join(SCORE_WORDS)})\s+)?({_COMPARATOR})\s+(\d+(?:\.\d+)?)\b"
+)
+TOP_K_RE = re.compile(
+    r"\b(?:top|best|worst|bottom|lowest|highest|weakest)\s+(\d+)\b|\b(\d+)\s+(?:best|worst|top|lowest|highest)\b"
+)
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+def _variants(phrase):
+    """The phrase plus its simple plural, for single words"""
+    tokens = tuple(tokenize(phrase))
+    if len(tokens) != 1 or len(tokens[0]) < 3:
+        return [tokens]
+    word = tokens[0]
+    plural = word + "es" if word.endswith(("s", "x", "ch", "sh")) else word + "s"
+    return [tokens, (plural,)]
+
+
+@dataclass(frozen=True)
+class Route:
+    """Classification of one question"""
+    question: str
+    intents: frozenset
+    topics: frozenset
+    entities: dict
+    matches: tuple
+    confidence: float
+    comparison: tuple = None    # (operator, label, value) of the question's only "<comparator> N"
+    on_score: bool = False      # that comparison follows a score word: "score above 80"
+    top_k: int = None           # "top 10", "5 best"
+    best: bool = None           # first superlative: True for best/top/highest, False for worst/lowest
+
+    def has(self, *names):
+        """True if any of names is a matched intent or topic"""
+        return any(name in self.intents or name in self.topics for name in names)
+
+    def matched(self, *keywords):
+        """True if any of the literal keywords appeared in the question"""
+        return any(keyword in self.matches for keyword in keywords)
+
+
+def parse_comparison(text):
+    """(operator, label, value, on_score) for text's single "<comparator> N", else None
+
+    A second number or comparator is a condition a single threshold
+    would drop, so text with more than one of either has no comparison.
+    """
+    text = text.lower()
+    if len(NUMBER_RE.findall(text)) != 1 or len(COMPARATOR_RE.findall(text)) != 1:
+        return None
+    match = COMPARISON_RE.search(text)
+    if not match:
+        return None
+    op, label = COMPARISON_WORDS[match.group(2)]
+    return op, label, float(match.group(3)), match.group(1) is not None
+
+
+class IntentRouter:
+    """Phrase index over every keyword group, compiled once"""
+
+    def __init__(self, levels=None):
+        self._index = {}
+        for intent, phrases in INTENTS.items():
+            self._add(phrases, ("intent", intent))
+        for topic, phrases in TOPICS.items():
+            self._add(phrases, ("topic", topic))
+        for value, phrases in GENDER_WORDS.items():
+            self._add(phrases, ("entity", ("student_gender", value)))
+
+        # Course names and class levels come from the data itself
+        levels = levels or {}
+        for course in levels.get("course_name", []):
+            self._add([str(course)], ("topic", "course"))
+            self._add([str(course)], ("entity", ("course_name", course)))
+        for level in levels.get("class_level", []):
+            self._add([str(level)], ("topic", "class"))
+            self._add([str(level)], ("entity", ("class_level", level)))
+
+        # Longest phrase first so "how many" wins over "how"
+        for candidates in self._index.values():
+            candidates.sort(key=lambda c: -len(c[0]))
+
+    def _add(self, phrases, label):
+        for phrase in phrases:
+            for tokens in _variants(phrase):
+                if tokens:
+                    self._index.setdefault(tokens[0], []).append((tokens, label, phrase))
+
+    def classify(self, question):
+        """Return the Route for a question in one pass over its tokens"""
+        tokens = tokenize(question)
+        intents, topics, matches = set(), set(), []
+        entities = {}
+
+        for i, token in enumerate(tokens):
+            for phrase_tokens, (kind, value), phrase in self._index.get(token, ()):
+                if tuple(tokens[i:i + len(phrase_tokens)]) != phrase_tokens:
+                    continue
+                matches.append(phrase)
+                if kind == "intent":
+                    intents.add(value)
+                elif kind == "topic":
+                    topics.add(value)
+                else:
+                    dim, level = value
+                    if level not in entities.setdefault(dim, []):
+                        entities[dim].append(level)
+
+        confidence = 0.0
+        if intents:
+            confidence += 0.5 if len(intents) == 1 else 0.4
+        if topics:
+            confidence += 0.4
+        if entities:
+            confidence += 0.1
+
+        comparison = parse_comparison(question)
+        top_k = TOP_K_RE.search(question.lower())
+        superlatives = [SUPERLATIVES[token] for token in tokens if token in SUPERLATIVES]
+
+        return Route(
+            question=question,
+            intents=frozenset(intents),
+            topics=frozenset(topics),
+            entities=entities,
+            matches=tuple(matches),
+            confidence=round(min(confidence, 1.0), 2),
+            comparison=comparison[:3] if comparison else None,
+            on_score=bool(comparison and comparison[3]),
+            top_k=int(top_k.group(1) or top_k.group(2)) if top_k else None,
+            best=superlatives[0] if superlatives else None,
+        )
@@ -0,0 +1,238 @@
+"""
+Completion backends, chosen with LLM_BACKEND.
+
+Engine only needs complete(**request) -> Completion, stream(**request)
+-> iterator of text deltas, embed(text) and the in_flight / waiting /
+max_queue counters, so anything with those can answer questions:
+
+- "openai" (default): LLMClient against the OpenAI API, or any
+  compatible server named by OPENAI_BASE_URL.
+- "template": a deterministic offline answer written from the stat
+  blocks already in the prompt. No network, no API key, so air-gapped
+  sites still get the local numeric answers plus a readable summary.
+- "stub": an OpenAI-compatible HTTP server started in-process that
+  serves the template answers, with LLM_STUB_LATENCY seconds before the
+  first token and LLM_STUB_TOKEN_DELAY between tokens. Requests go
+  through the real LLMClient, so queueing, streaming, latency and cache
+  behaviour can be measured offline.
+
+The stub also runs standalone for other processes to point at:
+
+    python llm_backends.py --port 8765 --latency 0.4 --token-delay 0.02
+
+Each backend has a name that is part of the response-cache key, so
+offline answers are never served once a real model is configured.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from llm_client import MAX_QUEUE, MAX_RATE, Completion, LLMClient
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+STUB_LATENCY = float(os.getenv("LLM_STUB_LATENCY", 0.4))
+STUB_TOKEN_DELAY = float(os.getenv("LLM_STUB_TOKEN_DELAY", 0.02))
+EMBEDDING_DIMENSIONS = 256
+
+# Stat blocks rendered by prompt_builder.assemble_context, e.g. "COURSE SCORES: Science 71.4 | ..."
+_BLOCK = re.compile(r"^([A-Z][A-Z -]+): (.+)$")
+_QUESTION = re.compile(r'^USER QUESTION: "(.*)"$', re.MULTILINE)
+
+
+# ==================================================
+# DETERMINISTIC ANSWERS
+# ==================================================
+def template_answer(prompt, max_tokens=200):
+    """Markdown answer listing the prompt's stat blocks, most relevant first"""
+    match = _QUESTION.search(prompt)
+    question = match.group(1) if match else "Your question"
+    # The stat blocks are the paragraph right after the question line
+    context = prompt[match.end():].strip().split("\n\n")[0] if match else ""
+    blocks = [m.groups() for m in map(_BLOCK.match, context.splitlines()) if m]
+    # Prompts rank blocks by relevance; short answers keep the leading few
+    blocks = blocks[:max(1, max_tokens // 50)]
+
+    lines = [f"### 📊 {question.rstrip('?')}", "",
+             "*Offline answer: the figures below come straight from the data summary.*", ""]
+    for header, items in blocks:
+        lines.append(f"- **{header.capitalize()}:** {items.replace(' | ', ' · ')}")
+    return "\n".join(lines)
+
+
+def hashed_embedding(text, dimensions=EMBEDDING_DIMENSIONS):
+    """Unit bag-of-words vector; questions sharing most words land close together"""
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for word in re.findall(r"\w+", text.lower()):
+        digest = hashlib.blake2b(word.encode(), digest_size=8).digest()
+        vector[int.from_bytes(digest, "little") % dimensions] += 1.0
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).tolist()
+
+
+def _tokens(text):
+    # Streamed in word-sized pieces, like a model emitting tokens
+    return re.findall(r"\s*\S+", text)
+
+
+# ==================================================
+# TEMPLATE BACKEND
+# ==================================================
+class TemplateBackend:
+    """In-process backend returning template_answer, optionally with simulated latency"""
+
+    name = "template"
+
+    def __init__(self, latency=0.0, token_delay=0.0, max_queue=MAX_QUEUE):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.waiting = 0
+        self._lock = threading.Lock()
+
+    def _begin(self):
+        with self._lock:
+            self.in_flight += 1
+        time.sleep(self.latency)
+
+    def _end(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def complete(self, **request):
+        self._begin()
+        try:
+            text = template_answer(request["messages"][-1]["content"], request.get("max_tokens", 200))
+            return Completion(text, len(_tokens(text)))
+        finally:
+            self._end()
+
+    def stream(self, **request):
+        def iterate():
+            self._begin()
+            try:
+                text = template_answer(request["messages"][-1]["content"], request.get("max_tokens", 200))
+                for i, token in enumerate(_tokens(text)):
+                    if i:
+                        time.sleep(self.token_delay)
+                    yield token
+            finally:
+                self._end()
+
+        return iterate()
+
+    def embed(self, text, model=None):
+        return hashed_embedding(text)
+
+
+# ==================================================
+# OPENAI-COMPATIBLE STUB SERVER
+# ==================================================
+class StubHandler(BaseHTTPRequestHandler):
+    """Chat completions (plain and streamed) and embeddings endpoints serving template answers"""
+
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    token_delay = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _chunk(self, text):
+        data = text.encode()
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(self.latency)
+
+        if self.path.endswith("/embeddings"):
+            self._json({"object": "list", "model": request["model"],
+                        "data": [{"object": "embedding", "index": 0,
+                                  "embedding": hashed_embedding(request["input"])}],
+                        "usage": {"prompt_tokens": 0, "total_tokens": 0}})
+            return
+
+        text = template_answer(request["messages"][-1]["content"], request.get("max_tokens", 200))
+        tokens = _tokens(text)
+        base = {"id": "stub", "created": int(time.time()), "model": request["model"]}
+        if not request.get("stream"):
+            self._json({**base, "object": "chat.completion",
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": text}}],
+                        "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens),
+                                  "total_tokens": len(tokens)}})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(self.token_delay)
+            chunk = {**base, "object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "finish_reason": None, "delta": {"content": token}}]}
+            self._chunk(f"data: {json.dumps(chunk)}\n\n")
+        self._chunk("data: [DONE]\n\n")
+        self._chunk("")
+
+
+def start_stub(port=0, latency=STUB_LATENCY, token_delay=STUB_TOKEN_DELAY):
+    """Serve the stub on a daemon thread; returns (server, base_url)"""
+    handler = type("Handler", (StubHandler,), {"latency": latency, "token_delay": token_delay})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="llm-stub", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/v1"
+
+
+# ==================================================
+# SELECTION
+# ==================================================
+def make_client(backend=None, api_key=None, max_rate=MAX_RATE):
+    """Completion backend named by backend (default LLM_BACKEND)"""
+    backend = backend or LLM_BACKEND
+    if backend == "openai":
+        return LLMClient(api_key=api_key or os.getenv("OPENAI_API_KEY"), max_rate=max_rate)
+    if backend == "template":
+        return TemplateBackend()
+    if backend == "stub":
+        _, base_url = start_stub()
+        return LLMClient(api_key="stub", base_url=base_url, max_rate=max_rate, name="stub")
+    raise ValueError(f"unknown LLM_BACKEND {backend!r} (expected openai, template or stub)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the OpenAI-compatible stub backend")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=STUB_LATENCY, help="seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=STUB_TOKEN_DELAY, help="seconds between tokens")
+    args = parser.parse_args(argv)
+
+    server, base_url = start_stub(args.port, args.latency, args.token_delay)
+    print(f"Stub LLM at {base_url}", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Process-wide OpenAI client.
+
+One AsyncOpenAI client runs on a dedicated event-loop thread and is
+shared by every Streamlit session, so HTTP connections are pooled and
+kept alive instead of being opened per session. Session threads hand
+their requests to the loop and wait on the result. A semaphore bounds
+how many requests are in flight. Requests beyond that wait in FIFO order,
+up to a bounded queue length, and the rest are rejected. Transient
+failures are retried with exponential backoff and full jitter. An
+optional request rate spaces out request starts for bulk callers such as
+batch runs.
+
+LLMClient is the "openai" completion backend: complete() returns a
+Completion and stream() an iterator of text deltas, the interface every
+backend in llm_backends.py implements.
+"""
+import asyncio
+import os
+import queue
+import random
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+from openai import (
+    APIConnectionError,
+    APITimeoutError,
+    AsyncOpenAI,
+    InternalServerError,
+    RateLimitError,
+)
+
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 16))
+MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", 256))
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 4))
+REQUEST_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 60))
+MAX_RATE = float(os.getenv("LLM_MAX_RATE", 0))  # requests per second; 0 = unlimited
+
+RETRYABLE = (APIConnectionError, APITimeoutError, InternalServerError, RateLimitError)
+
+_DONE = object()
+
+
+class QueueFullError(RuntimeError):
+    """Raised when too many requests are already waiting for a slot"""
+
+
+@dataclass(frozen=True)
+class Completion:
+    """Text of a finished completion and, when the backend reports it, its token count"""
+    text: str
+    completion_tokens: Optional[int] = None
+
+
+class LLMClient:
+    """Shared async client with bounded concurrency, a request queue and retries"""
+
+    def __init__(self, api_key=None, base_url=None, max_concurrency=MAX_CONCURRENCY,
+                 max_queue=MAX_QUEUE, max_retries=MAX_RETRIES, timeout=REQUEST_TIMEOUT,
+                 max_rate=MAX_RATE, name="openai"):
+        self.name = name
+        # Retries are handled here so a backing-off request gives up its slot
+        self._client = AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0, timeout=timeout)
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.max_rate = max_rate
+        self.in_flight = 0
+        self.waiting = 0
+
+        self._loop = asyncio.new_event_loop()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._next_start = 0.0
+        self._thread = threading.Thread(target=self._loop.run_forever, name="llm-client", daemon=True)
+        self._thread.start()
+
+    # ==================================================
+    # EVENT-LOOP SIDE
+    # ==================================================
+    async def _acquire(self):
+        if self.waiting >= self.max_queue:
+            raise QueueFullError("Too many questions are waiting - please try again shortly")
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        await self._throttle()
+
+    async def _throttle(self):
+        # Only the loop thread touches _next_start, so no lock is needed
+        if not self.max_rate:
+            return
+        now = self._loop.time()
+        start = max(now, self._next_start)
+        self._next_start = start + 1.0 / self.max_rate
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    def _release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    async def _backoff(self, attempt):
+        await asyncio.sleep(random.uniform(0, min(20.0, 0.5 * 2 ** attempt)))
+
+    async def _with_retries(self, call):
+        for attempt in range(self.max_retries + 1):
+            await self._acquire()
+            try:
+                return await call()
+            except RETRYABLE:
+                if attempt == self.max_retries:
+                    raise
+            finally:
+                self._release()
+            await self._backoff(attempt)
+
+    async def _stream(self, request, chunks, cancelled):
+        try:
+            for attempt in range(self.max_retries + 1):
+                await self._acquire()
+                started = False
+                try:
+                    response = await self._client.chat.completions.create(stream=True, **request)
+                    async for chunk in response:
+                        if cancelled.is_set():
+                            await response.close()
+                            return
+                        started = True
+                        chunks.put(chunk)
+                    return
+                except RETRYABLE:
+                    # Only retry while nothing has been handed to the reader yet
+                    if started or attempt == self.max_retries:
+                        raise
+                finally:
+                    self._release()
+                await self._backoff(attempt)
+        except Exception as e:
+            chunks.put(e)
+        finally:
+            chunks.put(_DONE)
+
+    def _submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    # ==================================================
+    # SESSION-THREAD SIDE
+    # ==================================================
+    def complete(self, **request):
+        """Blocking chat completion; returns a Completion"""
+        call = lambda: self._client.chat.completions.create(**request)
+        response = self._submit(self._with_retries(call)).result()
+        usage = response.usage
+        return Completion(response.choices[0].message.content or "",
+                          usage.completion_tokens if usage else None)
+
+    def stream(self, **request):
+        """Start a streamed chat completion and return an iterator of text deltas
+
+        The request is sent immediately; the iterator only waits on chunks.
+        """
+        chunks = queue.Queue()
+        cancelled = threading.Event()
+        self._submit(self._stream(request, chunks, cancelled))
+
+        def iterate():
+            try:
+                while True:
+                    item = chunks.get()
+                    if item is _DONE:
+                        return
+                    if isinstance(item, Exception):
+                        raise item
+                    delta = item.choices[0].delta.content if item.choices else None
+                    if delta:
+                        yield delta
+            finally:
+                cancelled.set()
+
+        return iterate()
+
+    def embed(self, text, model="text-embedding-3-small"):
+        call = lambda: self._client.embeddings.create(model=model, input=text)
+        return self._submit(self._with_retries(call)).result().data[0].embedding
@@ -0,0 +1,269 @@
+"""
+Local answer path for purely numeric questions.
+
+Questions such as "How many students score above 80?", "Which class
+performs best?" or "Who are the top 5 students?" have exact answers in
+the data. The planner recognizes a handful of aggregate, ranking,
+threshold and student-list shapes from the question's Route and answers
+them from the Summary, the StudentTable and the selected rows, using
+templated markdown. Anything open-ended returns None and goes to the LLM,
+and so does anything the plans cannot answer exactly: questions about an
+engagement measure rather than the score, and questions naming a course,
+class or gender that the plan would not apply as a filter. Student lists
+are the exception: the caller builds their StudentTable with the named
+levels applied (see filter_index.narrow_filters).
+"""
+import threading
+
+from cube import TARGET
+from intents import tokenize
+from students import AT_RISK_SCORE, TOP_SHARE
+
+# Words that ask for explanation or judgement rather than a number
+OPEN_ENDED = {
+    "why", "explain", "should", "recommend", "recommendation", "recommendations",
+    "trend", "trends", "insight", "insights", "interesting", "suggest", "improve",
+    "concerning", "reason", "reasons", "tell",
+}
+
+RISK_WORDS = {"risk", "struggling", "failing", "weakest"}
+DEFAULT_TOP_K = 5
+MAX_TOP_K = 50
+
+# Measures other than the assessment score; the plans only compute scores
+ENGAGEMENT_TOPICS = ("attendance", "participation", "moodle", "downloads")
+
+# "How many students are there?" - anything beyond these words asks for more than the size
+SIZE_WORDS = {
+    "how", "many", "what", "is", "are", "there", "do", "we", "have", "the", "a", "of", "in",
+    "total", "number", "count", "student", "students", "assessment", "assessments",
+    "course", "courses", "data", "dataset", "view", "current", "this", "records",
+}
+
+DIMENSION_TOPICS = {
+    "course": ("course_name", "course"),
+    "class": ("class_level", "class"),
+    "gender": ("student_gender", "gender"),
+}
+
+
+class AnswerPaths:
+    """Thread-safe tally of which path served each question"""
+
+    def __init__(self):
+        self.counts = {"local": 0, "cache": 0, "llm": 0}
+        self._lock = threading.Lock()
+
+    def record(self, path):
+        with self._lock:
+            self.counts[path] = self.counts.get(path, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts)
+
+
+def _label(dim, level):
+    if dim == "student_gender":
+        return {"M": "Male", "F": "Female"}.get(level, level)
+    return level
+
+
+def plan_question(route):
+    """Return a plan tuple for a question that can be answered locally, else None"""
+    tokens = set(tokenize(route.question))
+    if tokens & OPEN_ENDED or route.has("overview", "correlation", *ENGAGEMENT_TOPICS):
+        return None
+
+    entities = [(dim, levels) for dim, levels in route.entities.items() if levels]
+    dims = [DIMENSION_TOPICS[t] for t in DIMENSION_TOPICS if t in route.topics]
+    superlative = route.best is not None
+
+    # "What is the average score in Biology?" reads the named level itself
+    if route.has("average") and not route.has("compare"):
+        if len(entities) == 1 and len(entities[0][1]) == 1:
+            return ("average", entities[0][0], entities[0][1][0])
+
+    # "Who are the top 5 students in C1?", "Which students are at risk?"
+    # Dimensions only implied by a named level are filters, not a ranking by that dimension
+    ranked_dims = [(dim, noun) for dim, noun in dims if dim not in route.entities]
+    if route.has("students") and not ranked_dims and (superlative or tokens & RISK_WORDS):
+        k = min(route.top_k or DEFAULT_TOP_K, MAX_TOP_K)
+        best = None if tokens & RISK_WORDS else route.best
+        return ("students", best, k)
+
+    # "Which course has the best students?" - ranked on the students, not the assessments
+    if route.has("students") and len(ranked_dims) == 1 and superlative:
+        return ("student_rank", ranked_dims[0], route.best)
+
+    # No other plan applies named levels
+    if entities:
+        return None
+
+    # "How many students score above 80?"
+    if route.has("distribution") or "count" in tokens or "number" in tokens:
+        # Only a single condition on the score (see intents.parse_comparison)
+        if route.comparison and route.on_score:
+            return ("threshold", *route.comparison)
+        if not tokens - SIZE_WORDS:
+            return ("count",)
+
+    # "Which class performs best?"
+    if superlative and len(dims) == 1 and tokens & {"which", "what", "who", "rank", "ranking"}:
+        return ("rank", dims[0], route.best)
+
+    if route.has("average") and not route.has("compare"):
+        if len(dims) == 1:
+            return ("average_by", dims[0])
+        if not dims:
+            return ("average", None, None)
+
+    return None
+
+
+def _student_rows(students):
+    rows = "\n".join(
+        f"| {s.student_name} | {s.class_level} | {s.mean_score:.1f} | {s.min_score:g}–{s.max_score:g} "
+        f"| {s.trend:+.1f} | {s.attendance:.0f}% | {s.percentile:.0f} |"
+        for s in students.itertuples()
+    )
+    return (
+        "| Student | Class | Average | Range | Trend per assessment | Attendance | Percentile |\n"
+        "|---|---|---|---|---|---|---|\n" + rows
+    )
+
+
+def answer_locally(route, selection, summary, students=None):
+    """Markdown answer for a locally answerable question, or None
+
+    students is the StudentTable for the same filters; questions that
+    list students need it, threshold questions use it when given.
+    """
+    plan = plan_question(route)
+    if plan is None or summary.records == 0:
+        return None
+    kind = plan[0]
+
+    if kind == "threshold":
+        _, op, label, value = plan
+        if students is not None:
+            n_students, n_total = students.count_where(op, value), len(students)
+        else:
+            student_means = selection.student_means(TARGET)
+            n_students, n_total = int(op(student_means, value).sum()), len(student_means)
+        n_scores = selection.count_where(TARGET, op, value)
+        n_records = summary.records
+        return (
+            f"### 🔍 Students scoring {label} {value:g}\n\n"
+            f"**{n_students}** of {n_total} students "
+            f"(**{100 * n_students / n_total:.1f}%**) average {label} **{value:g}**. "
+            f"Across individual assessments, **{n_scores:,}** of {n_records:,} scores "
+            f"(**{100 * n_scores / n_records:.1f}%**) are {label} {value:g}."
+        )
+
+    if kind == "students":
+        _, best, k = plan
+        if students is None or not len(students):
+            return None
+        if best is None:
+            at_risk = students.below(AT_RISK_SCORE)
+            if not len(at_risk):
+                lowest = students.top(1, best=False).iloc[0]
+                return (
+                    f"### ✅ No students at risk\n\n"
+                    f"No student in the current view averages below **{AT_RISK_SCORE:g}**. "
+                    f"The lowest average is **{lowest.mean_score:.1f}** ({lowest.student_name})."
+                )
+            declining = int((at_risk["trend"] < 0).sum())
+            shown = "All of them:" if len(at_risk) <= k else f"The lowest {k}:"
+            return (
+                f"### ⚠️ At-risk students\n\n"
+                f"**{len(at_risk)}** of {len(students)} students (**{100 * len(at_risk) / len(students):.1f}%**) "
+                f"average below **{AT_RISK_SCORE:g}**, and **{declining}** of them are trending down. {shown}\n\n"
+                + _student_rows(at_risk.head(k))
+            )
+        top = students.top(k, best=best)
+        return (
+            f"### {'🏆 Top' if best else '📉 Lowest'} {len(top)} students\n\n"
+            f"Ranked by average score among {len(students)} students in the current view.\n\n"
+            + _student_rows(top)
+        )
+
+    if kind == "student_rank":
+        _, (dim, noun), best = plan
+        if students is None or not len(students):
+            return None
+        groups = students.compare(dim)
+        if not best:
+            groups = groups.iloc[::-1]
+        top = next(groups.itertuples())
+        leader = _label(dim, top.Index)
+        rows = "\n".join(
+            f"| {_label(dim, g.Index)} | {g.students} | {g.mean_average:.1f} | {100 * g.top_share:.0f}% |"
+            for g in groups.itertuples()
+        )
+        return (
+            f"### {'🏆' if best else '📉'} {noun.title()} with the {'best' if best else 'weakest'} students\n\n"
+            f"**{leader}** has the {'most' if best else 'fewest'} top students: **{100 * top.top_share:.0f}%** "
+            f"of its {top.students} students are in the top {100 * TOP_SHARE:.0f}% of the current view, "
+            f"with a mean student average of **{top.mean_average:.1f}**. Ranked on each student's own average "
+            f"(from the student table), not on raw assessment scores.\n\n"
+            f"| {noun.title()} | Students | Mean student average | In top {100 * TOP_SHARE:.0f}% |\n"
+            f"|---|---|---|---|\n{rows}"
+        )
+
+    if kind == "count":
+        return (
+            f"### 📋 Dataset size\n\n"
+            f"The current view has **{summary.students}** students, **{summary.records:,}** assessments "
+            f"and **{len(summary.courses)}** courses ({', '.join(summary.courses)})."
+        )
+
+    if kind == "rank":
+        _, (dim, noun), best = plan
+        data = summary.scores_by(dim).sort_values(ascending=not best)
+        leader = _label(dim, data.index[0])
+        answer = (
+            f"### {'🏆' if best else '📉'} {'Top' if best else 'Lowest'} {noun}\n\n"
+            f"**{leader}** {'leads' if best else 'trails'} with an average score of **{data.iloc[0]:.1f}**"
+        )
+        if len(data) > 1:
+            gap = abs(data.iloc[0] - data.iloc[1])
+            answer += (
+                f", {gap:.1f} points {'ahead of' if best else 'behind'} "
+                f"**{_label(dim, data.index[1])}** ({data.iloc[1]:.1f})"
+            )
+        answer += f". The overall average is **{summary.means[TARGET]:.1f}**."
+        if len(data) > 2:
+            ranking = ", ".join(f"{_label(dim, level)} {score:.1f}" for level, score in data.items())
+            answer += f"\n\n**Full ranking:** {ranking}"
+        return answer
+
+    if kind == "average":
+        _, dim, level = plan
+        if dim is None:
+            return (
+                f"### 📊 Average score\n\n"
+                f"The average assessment score is **{summary.means[TARGET]:.1f}** "
+                f"across **{summary.records:,}** assessments."
+            )
+        data = summary.scores_by(dim)
+        if level not in data.index:
+            return None
+        return (
+            f"### 📊 Average score for {_label(dim, level)}\n\n"
+            f"**{_label(dim, level)}** averages **{data.loc[level]:.1f}**, "
+            f"compared with **{summary.means[TARGET]:.1f}** overall."
+        )
+
+    if kind == "average_by":
+        _, (dim, noun) = plan
+        data = summary.scores_by(dim).sort_values(ascending=False)
+        rows = "\n".join(f"| {_label(dim, level)} | {score:.1f} |" for level, score in data.items())
+        return (
+            f"### 📊 Average score by {noun}\n\n"
+            f"| {noun.title()} | Average |\n|---|---|\n{rows}\n\n"
+            f"Overall average: **{summary.means[TARGET]:.1f}**."
+        )
+
+    return None
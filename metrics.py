@@ -0,0 +1,137 @@
+"""
+In-process latency instrumentation.
+
+Every hot-path stage (data load, filter, stats, prompt build, LLM call,
+time to first token, chart build, render) is recorded as a timed span.
+Each span name keeps a rolling window of its most recent samples, from
+which p50/p95/p99 are read, plus all-time count and sum. Throughput
+values such as LLM tokens per second are kept the same way as rates.
+
+METRICS is the process-wide registry shared by the engine, the app and
+the API. snapshot() gives a JSON-ready view and to_prometheus() renders
+the same data, together with the cache and answer-path counters, in the
+Prometheus text exposition format.
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+WINDOW = int(os.getenv("METRICS_WINDOW", 1024))
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class RollingHistogram:
+    """The last `window` samples plus all-time count and sum"""
+
+    def __init__(self, window=WINDOW):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def summary(self):
+        values = np.fromiter(self.samples, dtype=float)
+        quantiles = np.quantile(values, QUANTILES) if len(values) else [float("nan")] * len(QUANTILES)
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": float(values.mean()) if len(values) else float("nan"),
+            **{f"p{round(q * 100)}": float(v) for q, v in zip(QUANTILES, quantiles)},
+        }
+
+
+class Metrics:
+    """Thread-safe registry of span timings and rates"""
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.spans = {}
+        self.rates = {}
+        self._lock = threading.Lock()
+
+    def _add(self, table, name, value):
+        with self._lock:
+            histogram = table.get(name)
+            if histogram is None:
+                histogram = table[name] = RollingHistogram(self.window)
+            histogram.add(value)
+
+    def observe(self, span, seconds):
+        self._add(self.spans, span, seconds)
+
+    def observe_rate(self, name, value):
+        self._add(self.rates, name, value)
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "window": self.window,
+                "spans": {name: h.summary() for name, h in sorted(self.spans.items())},
+                "rates": {name: h.summary() for name, h in sorted(self.rates.items())},
+            }
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+            self.rates.clear()
+
+
+METRICS = Metrics()
+
+
+def _number(value):
+    return "NaN" if value != value else repr(float(value))
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+def to_prometheus(snapshot, counters=None, prefix="chatbot"):
+    """Prometheus text format for a snapshot() plus counters
+
+    counters maps a metric name to (label name, {label value: number}),
+    e.g. {"answers_total": ("path", {"local": 3, "llm": 5})}. Names ending
+    in _total are exported as counters, the rest as gauges.
+    """
+    lines = []
+
+    def summary(metric, help_text, table, label):
+        if not table:
+            return
+        lines.append(f"# HELP {prefix}_{metric} {help_text}")
+        lines.append(f"# TYPE {prefix}_{metric} summary")
+        for name, stats in table.items():
+            for q in QUANTILES:
+                lines.append(f"{prefix}_{metric}{_labels(**{label: name, 'quantile': q})} "
+                             f"{_number(stats[f'p{round(q * 100)}'])}")
+            lines.append(f"{prefix}_{metric}_sum{_labels(**{label: name})} {_number(stats['sum'])}")
+            lines.append(f"{prefix}_{metric}_count{_labels(**{label: name})} {stats['count']}")
+
+    summary("span_seconds", f"Hot-path span latency (quantiles over the last {snapshot['window']} samples)",
+            snapshot["spans"], "span")
+    summary("rate", f"Throughput rates (quantiles over the last {snapshot['window']} samples)",
+            snapshot["rates"], "name")
+
+    for metric, (label, values) in (counters or {}).items():
+        kind = "counter" if metric.endswith("_total") else "gauge"
+        lines.append(f"# TYPE {prefix}_{metric} {kind}")
+        for key, value in values.items():
+            lines.append(f"{prefix}_{metric}{_labels(**{label: key})} {_number(value)}")
+    return "\n".join(lines) + "\n"
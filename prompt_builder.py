@@ -0,0 +1,150 @@
+"""
+Token-budgeted prompt context.
+
+Every stat block that could go into a prompt is scored for relevance to
+the question's Route, written in a compact one-line format and then
+packed greedily, most relevant first, into a fixed token budget. Tables
+that do not fit are cut down to their leading rows rather than dropped.
+Prompt size therefore stays flat as the number of courses and classes
+grows. Lines summarising earlier turns of a conversation (see
+conversation.py) go ahead of the question under their own budget.
+"""
+import operator
+import os
+
+from cube import TARGET
+from students import AT_RISK_SCORE
+
+# Optional: exact token counts when tiktoken and its encoding are available
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("o200k_base")
+    TIKTOKEN_ENABLED = True
+except Exception:
+    TIKTOKEN_ENABLED = False
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("PROMPT_CONTEXT_TOKENS", 300))
+
+# Bump when the block formats change so cached answers are not reused
+CONTEXT_FORMAT_VERSION = "3"
+
+ENGAGEMENT = [
+    ("attendance_rate", "Attendance", "%"),
+    ("raised_hand_count", "Hand Raises", ""),
+    ("moodle_views", "Moodle Views", ""),
+    ("resources_downloads", "Downloads", ""),
+]
+ENGAGEMENT_TOPICS = ("attendance", "participation", "moodle", "downloads")
+
+
+def count_tokens(text):
+    if TIKTOKEN_ENABLED:
+        return len(_ENCODING.encode(text))
+    # Roughly four characters per token for English text and numbers
+    return max(1, (len(text) + 3) // 4)
+
+
+def _label(dim, level):
+    if dim == "student_gender":
+        return {"M": "Male", "F": "Female"}.get(level, level)
+    return str(level)
+
+
+def _scores(summary, dim):
+    data = summary.scores_by(dim).sort_values(ascending=False)
+    return [f"{_label(dim, level)} {score:.1f}" for level, score in data.items()]
+
+
+def candidate_blocks(summary, route, students=None):
+    """(relevance, header, items) for every block worth considering
+
+    Student-level blocks are only offered when a StudentTable is given.
+    """
+    overview = route.has("overview")
+    correlation = route.has("correlation")
+    engagement_topic = route.has(*ENGAGEMENT_TOPICS)
+    dimension_topic = route.has("course", "class", "gender")
+
+    blocks = [(
+        2.0, "DATASET",
+        [f"{summary.records:,} assessments", f"{summary.students} students",
+         f"Overall Average {summary.means[TARGET]:.1f}/100"],
+    )]
+
+    for dim, levels in route.entities.items():
+        group = summary.group_means.get(dim)
+        for level in levels:
+            if group is not None and level in group.index:
+                n = int(summary.group_counts[dim].get(level, 0))
+                blocks.append((1.5, f"FOCUS {_label(dim, level)}", [
+                    f"avg {group.loc[level, TARGET]:.1f}", f"{n:,} assessments",
+                ]))
+
+    course_relevance = (
+        1.0 if route.has("course")
+        else 0.6 if route.has("compare", "average") and not dimension_topic
+        else 0.4 if overview else 0.0
+    )
+    blocks.append((course_relevance, "COURSE SCORES", _scores(summary, "course_name")))
+    blocks.append((1.0 if route.has("class") else 0.4 if overview else 0.0,
+                   "CLASS SCORES", _scores(summary, "class_level")))
+    blocks.append((1.0 if route.has("gender") else 0.4 if overview else 0.0,
+                   "GENDER SCORES", _scores(summary, "student_gender")))
+
+    # Course names alone are only useful when no course table made it in
+    if course_relevance == 0.0:
+        blocks.append((0.3, "COURSES", list(summary.courses)))
+
+    blocks.append((
+        1.0 if overview else 0.8 if engagement_topic else 0.5 if correlation else 0.0,
+        "ENGAGEMENT AVERAGES",
+        [f"{label} {summary.means[col]:.1f}{unit}" for col, label, unit in ENGAGEMENT],
+    ))
+    blocks.append((
+        1.0 if overview or correlation else 0.7 if engagement_topic else 0.0,
+        "CORRELATIONS WITH SCORES",
+        [f"{label} {summary.correlations[col]:.3f}" for col, label, _ in ENGAGEMENT],
+    ))
+
+    if students is not None and len(students):
+        about_students = route.has("students")
+        blocks.append((0.9 if about_students else 0.3 if overview else 0.0, "TOP STUDENTS", [
+            f"{s.student_name} {s.mean_score:.1f}" for s in students.top(5).itertuples()
+        ]))
+        at_risk = students.count_where(operator.lt, AT_RISK_SCORE)
+        blocks.append((0.9 if about_students else 0.45 if overview else 0.0, "LOWEST STUDENTS", [
+            f"{at_risk} of {len(students)} average below {AT_RISK_SCORE:g}",
+            *(f"{s.student_name} {s.mean_score:.1f} (trend {s.trend:+.1f})"
+              for s in students.top(5, best=False).itertuples()),
+        ]))
+    return [block for block in blocks if block[0] > 0]
+
+
+def _render(header, items, hidden=0):
+    text = f"{header}: " + " | ".join(items)
+    return text + (f" | +{hidden} more" if hidden else "")
+
+
+def assemble_context(question, summary, route, budget=CONTEXT_TOKEN_BUDGET, students=None, history=()):
+    """Return (context, tokens) for the question within the token budget
+
+    history lines come already trimmed to their own budget, which is
+    added to this one rather than taken out of it.
+    """
+    lines = [*history, *([""] if history else []), f'USER QUESTION: "{question}"', ""]
+    used = count_tokens("\n".join(lines))
+    if history:
+        budget += count_tokens("\n".join(history))
+
+    ranked = sorted(candidate_blocks(summary, route, students), key=lambda block: -block[0])
+    for _, header, items in ranked:
+        # Drop trailing rows until the block fits (tables are sorted best-first)
+        for keep in range(len(items), 0, -1):
+            text = _render(header, items[:keep], len(items) - keep)
+            cost = count_tokens(text) + 1
+            if used + cost <= budget:
+                lines.append(text)
+                used += cost
+                break
+
+    return "\n".join(lines) + "\n", used
@@ -0,0 +1,196 @@
+"""
+Watched data sources for incremental refresh.
+
+Each source remembers how much of it has already been merged and its
+poll() returns only the rows added since, or None when nothing changed.
+All of them are cheap to poll when idle: a stat() of the workbook, a
+directory listing, or one MAX(rowid) query.
+
+- WorkbookSource: rows appended below the last seen row of the dataset
+  workbook. Sources are append-only; a workbook that lost rows raises
+  SourceRewritten so the caller can fall back to a full reload.
+- CsvDropSource: every new *.csv file in a drop folder. Write files
+  elsewhere and move them in so a half-written file is never read.
+- SQLiteSource: rows of a table with a rowid above the last one seen.
+
+poll(validate) runs the new rows through validate (the caller passes
+conform) before the source moves past them, so rows that fail are
+offered again rather than lost. A drop folder validates file by file:
+a bad file is logged and moved to its rejected/ subfolder, and the
+good files polled with it still go through. Bad workbook rows are
+re-read once the workbook changes; a bad SQLite row holds the table
+back until it is fixed. Callers that fail to merge what poll returned
+put the sources back with restore_positions.
+
+Sources start from an empty state except the workbook, which starts at
+the rows already loaded, so a restart replays the folder and table on
+top of the workbook. That is what an in-memory dataset needs. A SQLite
+store (see store.py) already holds those rows, so it saves each source's
+position with every merge and sources resume from there instead.
+"""
+import glob
+import json
+import logging
+import os
+import sqlite3
+
+import pandas as pd
+
+from schema import apply_schema
+
+DROP_DIR = os.getenv("DATA_DROP_DIR")
+SQLITE_PATH = os.getenv("DATA_SQLITE_PATH")
+SQLITE_TABLE = os.getenv("DATA_SQLITE_TABLE", "assessments")
+REJECTED_DIR = "rejected"
+REFRESH_INTERVAL = float(os.getenv("DATA_REFRESH_INTERVAL", 30))
+
+
+log = logging.getLogger(__name__)
+
+
+def _unchanged(rows):
+    return rows
+
+
+class SourceRewritten(RuntimeError):
+    """Raised when a source changed in a way appends cannot express"""
+
+
+class WorkbookSource:
+    def __init__(self, path, rows_seen):
+        self.path = path
+        self.rows_seen = rows_seen
+        self._stamp = self._stat()
+
+    @property
+    def key(self):
+        return f"workbook:{self.path}"
+
+    @property
+    def position(self):
+        return self.rows_seen
+
+    def restore(self, position):
+        self.rows_seen = position
+        self._stamp = None
+
+    def _stat(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def poll(self, validate=_unchanged):
+        stamp = self._stat()
+        if stamp == self._stamp:
+            return None
+        rows = pd.read_excel(self.path)
+        if len(rows) < self.rows_seen:
+            raise SourceRewritten(f"{self.path} now has fewer rows than were loaded")
+        # Not re-read until the workbook changes again, valid or not
+        self._stamp = stamp
+        new_rows = validate(rows.iloc[self.rows_seen:])
+        self.rows_seen = len(rows)
+        return new_rows
+
+
+class CsvDropSource:
+    def __init__(self, folder):
+        self.folder = folder
+        self.seen = set()
+
+    @property
+    def key(self):
+        return f"csv:{self.folder}"
+
+    @property
+    def position(self):
+        return sorted(os.path.basename(path) for path in self.seen)
+
+    def restore(self, position):
+        self.seen = {os.path.join(self.folder, name) for name in position}
+
+    def _reject(self, path, error):
+        log.warning("rejected %s: %s", path, error)
+        rejected = os.path.join(self.folder, REJECTED_DIR)
+        try:
+            os.makedirs(rejected, exist_ok=True)
+            os.replace(path, os.path.join(rejected, os.path.basename(path)))
+        except OSError:
+            # Left in place; remembered so it is not read again
+            self.seen.add(path)
+
+    def poll(self, validate=_unchanged):
+        paths = sorted(set(glob.glob(os.path.join(self.folder, "*.csv"))) - self.seen)
+        frames = []
+        for path in paths:
+            try:
+                frames.append(validate(pd.read_csv(path)))
+            except (ValueError, pd.errors.ParserError) as e:
+                self._reject(path, e)
+                continue
+            self.seen.add(path)
+        if not frames:
+            return None
+        return pd.concat(frames, ignore_index=True)
+
+
+class SQLiteSource:
+    def __init__(self, path, table=SQLITE_TABLE):
+        self.path = path
+        self.table = table
+        self.last_rowid = 0
+
+    @property
+    def key(self):
+        return f"sqlite:{self.path}:{self.table}"
+
+    @property
+    def position(self):
+        return self.last_rowid
+
+    def restore(self, position):
+        self.last_rowid = position
+
+    def poll(self, validate=_unchanged):
+        if not os.path.exists(self.path):
+            return None
+        with sqlite3.connect(self.path) as db:
+            (latest,) = db.execute(f'SELECT MAX(rowid) FROM "{self.table}"').fetchone()
+            if latest is None or latest <= self.last_rowid:
+                return None
+            rows = pd.read_sql_query(
+                f'SELECT * FROM "{self.table}" WHERE rowid > ? AND rowid <= ? ORDER BY rowid',
+                db, params=(self.last_rowid, latest),
+            )
+        rows = validate(rows)
+        self.last_rowid = latest
+        return rows
+
+
+def default_sources(path, rows_seen):
+    """The workbook (if any) plus any drop folder or SQLite table configured in the environment"""
+    sources = [WorkbookSource(path, rows_seen)] if path else []
+    if DROP_DIR:
+        sources.append(CsvDropSource(DROP_DIR))
+    if SQLITE_PATH:
+        sources.append(SQLiteSource(SQLITE_PATH))
+    return sources
+
+
+def positions(sources):
+    """{key: JSON-encoded position} of every source, for SQLiteStore.append to save"""
+    return {source.key: json.dumps(source.position) for source in sources}
+
+
+def restore_positions(sources, saved):
+    """Move sources to the positions saved by an earlier process, where there are any"""
+    for source in sources:
+        if source.key in saved:
+            source.restore(json.loads(saved[source.key]))
+
+
+def conform(rows, columns):
+    """Validated new rows with the columns of the dataset they are merged into"""
+    missing = [col for col in columns if col not in rows.columns]
+    if missing:
+        raise ValueError(f"new rows are missing columns: {', '.join(missing)}")
+    return apply_schema(rows[list(columns)].reset_index(drop=True))
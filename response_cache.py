@@ -0,0 +1,142 @@
+"""
+Persistent cache for LLM answers.
+
+Answers are keyed on the normalized question, the active filters, the
+dataset version and a hash of the prompt template, and stored in SQLite
+so they survive restarts and are shared by every session in the process.
+Entries expire after a TTL and the least recently used ones are evicted
+once the cache is full.
+
+When an embedding function is supplied, a miss on the exact key falls back
+to the closest earlier question with the same filters, dataset version and
+template, provided its cosine similarity clears a threshold.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from filter_index import canonical_filters
+
+CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", os.path.join(".data_cache", "responses.sqlite3"))
+CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", 24 * 3600))
+CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 2000))
+SIMILARITY_THRESHOLD = float(os.getenv("RESPONSE_CACHE_SIMILARITY", 0.95))
+
+
+def normalize_question(question):
+    """Lowercase, drop emoji/punctuation and collapse whitespace"""
+    text = re.sub(r"[^\w\s]", " ", question.lower())
+    return " ".join(text.split())
+
+
+def _digest(*parts):
+    return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed answer cache with TTL, LRU eviction and hit counters"""
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, max_entries=CACHE_SIZE,
+                 embed=None, similarity=SIMILARITY_THRESHOLD):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.embed = embed
+        self.similarity = similarity
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                scope TEXT NOT NULL,
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                embedding BLOB,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_scope ON responses (scope)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_used)")
+        self._db.commit()
+
+    def _keys(self, question, filters, version, template):
+        normalized = normalize_question(question)
+        scope = _digest(canonical_filters(filters), version, template)
+        return normalized, scope, _digest(normalized, scope)
+
+    def get(self, question, filters, version, template):
+        """Return the cached answer or None"""
+        normalized, scope, key = self._keys(question, filters, version, template)
+        now = time.time()
+
+        with self._lock:
+            self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            row = self._db.execute("SELECT key, answer FROM responses WHERE key = ?", (key,)).fetchone()
+
+        if row is None and self.embed is not None:
+            row = self._nearest(normalized, scope)
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                self._db.commit()
+                return None
+            self.hits += 1
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, row[0]))
+            self._db.commit()
+        return row[1]
+
+    def _nearest(self, normalized, scope):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key, answer, embedding FROM responses WHERE scope = ? AND embedding IS NOT NULL",
+                (scope,),
+            ).fetchall()
+        if not rows:
+            return None
+
+        try:
+            query = np.asarray(self.embed(normalized), dtype=np.float32)
+        except Exception:
+            return None
+        matrix = np.stack([np.frombuffer(r[2], dtype=np.float32) for r in rows])
+        scores = matrix @ query / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query) + 1e-12)
+        best = int(np.argmax(scores))
+        return rows[best][:2] if scores[best] >= self.similarity else None
+
+    def put(self, question, filters, version, template, answer):
+        normalized, scope, key = self._keys(question, filters, version, template)
+        embedding = None
+        if self.embed is not None:
+            try:
+                embedding = np.asarray(self.embed(normalized), dtype=np.float32).tobytes()
+            except Exception:
+                embedding = None
+
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, scope, normalized, answer, embedding, now, now),
+            )
+            self._db.execute("""
+                DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
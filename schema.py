@@ -0,0 +1,106 @@
+"""
+Column schema for the students dataset.
+
+The workbook parses into Python-object strings and 64-bit numbers. Every
+frame the app works with instead goes through apply_schema: names and
+dimensions become categoricals, the small counts narrow integers, and the
+scores and rates float32 (all values in the dataset are exact in float32).
+Values are validated on the way in, so a bad workbook or appended batch
+is rejected with every problem listed rather than failing later inside
+a summary.
+
+Group by categorical columns with observed=True so levels that are
+absent from a filtered view do not come back as empty groups.
+"""
+import numpy as np
+import pandas as pd
+
+SCHEMA = {
+    "student_id": "int32",
+    "student_name": "category",
+    "student_gender": "category",
+    "class_level": "category",
+    "course_name": "category",
+    "assessment_no": "int8",
+    "assessment_score": "float32",
+    "raised_hand_count": "int16",
+    "moodle_views": "int16",
+    "attendance_rate": "float32",
+    "resources_downloads": "int16",
+}
+
+# Inclusive bounds; integer columns are also bounded by their dtype
+RANGES = {
+    "student_id": (0, None),
+    "assessment_no": (1, None),
+    "assessment_score": (0, 100),
+    "raised_hand_count": (0, None),
+    "moodle_views": (0, None),
+    "attendance_rate": (0, 100),
+    "resources_downloads": (0, None),
+}
+
+
+class SchemaError(ValueError):
+    """Raised when a frame does not fit SCHEMA; the message lists every problem"""
+
+
+def _bounds(col, dtype):
+    low, high = RANGES.get(col, (None, None))
+    if np.dtype(dtype).kind == "i":
+        info = np.iinfo(dtype)
+        low = info.min if low is None else max(low, info.min)
+        high = info.max if high is None else min(high, info.max)
+    return low, high
+
+
+def apply_schema(df):
+    """Validated copy of df with SCHEMA dtypes; other columns pass through unchanged"""
+    missing = [col for col in SCHEMA if col not in df.columns]
+    if missing:
+        raise SchemaError(f"missing columns: {', '.join(missing)}")
+
+    problems = []
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        dtype = SCHEMA.get(col)
+        if dtype is None:
+            columns[col] = series
+            continue
+
+        empty = int(series.isna().sum())
+        if empty:
+            problems.append(f"{col}: {empty} empty values")
+            continue
+        if dtype == "category":
+            columns[col] = series.astype("category")
+            continue
+
+        values = pd.to_numeric(series, errors="coerce")
+        if values.isna().any():
+            problems.append(f"{col}: non-numeric values such as {series[values.isna()].iloc[0]!r}")
+            continue
+        if np.dtype(dtype).kind == "i" and (values != np.round(values)).any():
+            problems.append(f"{col}: non-integer values")
+            continue
+        low, high = _bounds(col, dtype)
+        if (low is not None and values.min() < low) or (high is not None and values.max() > high):
+            problems.append(f"{col}: values outside [{low}, {high}]")
+            continue
+        columns[col] = values.astype(dtype)
+
+    if problems:
+        raise SchemaError("; ".join(problems))
+    return pd.DataFrame(columns)
+
+
+def concat_rows(df, rows):
+    """Append schema-conformed rows to df, widening categoricals to cover new levels"""
+    widened = {}
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            known = df[col].cat.categories
+            categories = known.append(rows[col].cat.categories.difference(known))
+            widened[col] = pd.CategoricalDtype(categories)
+    return pd.concat([df.astype(widened), rows.astype(widened)], ignore_index=True)
@@ -0,0 +1,79 @@
+"""
+Stats engine.
+
+Turns a cube slice into a Summary holding every number the prompt
+builder, the charts and the sidebar metrics need: overall moments,
+correlations with the assessment score and per-dimension group means and
+counts. Everything is read from the stacked moments array in a single
+vectorized reduction per output axis, instead of one pandas pass per
+statistic.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from cube import COUNT, CROSS, DIMENSIONS, MEASURES, SUMS, SUMSQ, TARGET
+
+
+@dataclass(frozen=True)
+class Summary:
+    """Aggregates for one filter combination"""
+    records: int
+    students: int
+    courses: list
+    means: dict
+    stds: dict
+    correlations: dict
+    group_means: dict
+    group_counts: dict
+
+    def scores_by(self, dim):
+        """Mean assessment score per level of dim, like df.groupby(dim)[score].mean()"""
+        return self.group_means[dim][TARGET]
+
+
+def summarize(cube_slice):
+    """Compute a Summary from the cells of a CubeSlice"""
+    moments = cube_slice.moments
+    totals = moments.reshape(-1, moments.shape[-1]).sum(axis=0)
+    n = totals[COUNT]
+    t = MEASURES.index(TARGET)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = totals[SUMS] / n
+        variance = totals[SUMSQ] / n - means * means
+        stds = np.sqrt(variance * n / (n - 1))
+        covariance = totals[CROSS] / n - means * means[t]
+        correlations = covariance / np.sqrt(variance * variance[t])
+
+    group_means, group_counts = {}, {}
+    for axis, dim in enumerate(DIMENSIONS):
+        other_axes = tuple(i for i in range(len(DIMENSIONS)) if i != axis)
+        grouped = moments.sum(axis=other_axes)
+        counts = grouped[:, COUNT]
+        keep = counts > 0
+        index = pd.Index([level for level, k in zip(cube_slice.levels[dim], keep) if k], name=dim)
+
+        group_means[dim] = pd.DataFrame(
+            grouped[keep][:, SUMS] / counts[keep, None], index=index, columns=MEASURES
+        ).sort_index()
+        group_counts[dim] = pd.Series(
+            counts[keep].astype(int), index=index, name="count"
+        ).sort_values(ascending=False)
+
+    bitmap = cube_slice.student_bitmap
+    students = int(bitmap.reshape(-1, bitmap.shape[-1]).any(axis=0).sum()) if bitmap.size else 0
+    present = group_counts["course_name"].index
+    courses = [course for course in cube_slice.levels["course_name"] if course in present]
+
+    return Summary(
+        records=int(n),
+        students=students,
+        courses=courses,
+        means=dict(zip(MEASURES, means.tolist())),
+        stds=dict(zip(MEASURES, stds.tolist())),
+        correlations={col: float(r) for col, r in zip(MEASURES, correlations) if col != TARGET},
+        group_means=group_means,
+        group_counts=group_counts,
+    )
@@ -0,0 +1,236 @@
+"""
+Out-of-core SQLite backend for datasets larger than memory.
+
+The assessment table lives in one SQLite file, indexed on the filter
+dimensions and on student_id, and is never loaded as a frame. The cube
+is built from two GROUP BY queries, so the engine's summaries, prompt
+context and bar/pie charts work exactly as in memory; the per-student
+feature cells (see students.py) come from one more. The few
+operations that need row-level data (scatter samples, per-student means
+and threshold counts) run as filtered SQL and return only their
+aggregates. Queries use one connection per thread, because answers and
+charts are computed on worker threads.
+
+The store also keeps how far each watched source (see refresh.py) has
+been merged, committed together with the merged rows, so restarts never
+insert the same rows twice.
+
+Build a store from CSV/XLSX files (CSV is read in chunks) with
+
+    python store.py import data/*.csv --store .data_cache/assessments.sqlite3
+
+and run the app against it with DATA_BACKEND=sqlite.
+"""
+import argparse
+import operator
+import os
+import sqlite3
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+from cube import DIMENSIONS, FILTER_KEYS, MEASURES, TARGET, AggregateCube
+from schema import SCHEMA, apply_schema
+from students import AGGREGATIONS, ATTRIBUTES, CELL_KEYS, ENGAGEMENT, StudentFeatures
+
+BACKEND = os.getenv("DATA_BACKEND", "memory")
+STORE_PATH = os.getenv("DATA_STORE_PATH", os.path.join(".data_cache", "assessments.sqlite3"))
+TABLE = "assessments"
+CHUNK_ROWS = 200_000
+
+SQL_OPERATORS = {operator.gt: ">", operator.ge: ">=", operator.lt: "<", operator.le: "<="}
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+class SQLiteStore:
+    """Assessment table in SQLite; has FilterIndex's select() interface"""
+
+    def __init__(self, path=STORE_PATH, table=TABLE):
+        self.path = path
+        self.name = table
+        self.table = _quote(table)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        columns = ", ".join(
+            f"{_quote(col)} {'TEXT' if dtype == 'category' else 'INTEGER' if dtype.startswith('int') else 'REAL'}"
+            for col, dtype in SCHEMA.items()
+        )
+        db = self._db()
+        db.execute(f"CREATE TABLE IF NOT EXISTS {self.table} ({columns})")
+        dims = ", ".join(_quote(dim) for dim in DIMENSIONS)
+        db.execute(f"CREATE INDEX IF NOT EXISTS {_quote(table + '_cells')} ON {self.table} ({dims})")
+        db.execute(f"CREATE INDEX IF NOT EXISTS {_quote(table + '_students')} ON {self.table} (student_id)")
+        self.sources_table = _quote(table + "_sources")
+        db.execute(f"CREATE TABLE IF NOT EXISTS {self.sources_table} (key TEXT PRIMARY KEY, position TEXT)")
+        db.commit()
+
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path)
+        return db
+
+    @property
+    def columns(self):
+        return [row[1] for row in self._db().execute(f"PRAGMA table_info({self.table})")]
+
+    def __len__(self):
+        return self._db().execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def append(self, rows, positions=None):
+        """Insert schema-conformed rows, and the source positions they bring us to, in one transaction"""
+        with self._write_lock:
+            db = self._db()
+            try:
+                db.executemany(
+                    f"INSERT OR REPLACE INTO {self.sources_table} (key, position) VALUES (?, ?)",
+                    (positions or {}).items(),
+                )
+                rows.to_sql(self.name, db, if_exists="append", index=False)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+
+    def source_positions(self):
+        """{source key: JSON-encoded position} saved by append"""
+        return dict(self._db().execute(f"SELECT key, position FROM {self.sources_table}"))
+
+    def import_frames(self, frames):
+        """Validate and insert an iterable of frames (e.g. CSV chunks); returns rows added"""
+        added = 0
+        for frame in frames:
+            rows = apply_schema(frame)[list(SCHEMA)]
+            self.append(rows)
+            added += len(rows)
+        return added
+
+    def build_cube(self):
+        """AggregateCube with every statistic computed inside SQLite"""
+        dims = ", ".join(_quote(dim) for dim in DIMENSIONS)
+        measures = [_quote(col) for col in MEASURES]
+        target = _quote(TARGET)
+        terms = (
+            [f"SUM({m})" for m in measures]
+            + [f"SUM({m} * {m})" for m in measures]
+            + [f"SUM({m} * {target})" for m in measures]
+        )
+        db = self._db()
+        cells = pd.read_sql_query(
+            f"SELECT {dims}, COUNT(*), {', '.join(terms)} FROM {self.table} GROUP BY {dims}", db
+        )
+        members = pd.read_sql_query(f"SELECT DISTINCT {dims}, student_id FROM {self.table}", db)
+
+        # Columns come back in the cube's moments layout: count, sums, squares, cross sums
+        moments = cells.iloc[:, len(DIMENSIONS):].to_numpy(dtype=np.float64)
+        cube = AggregateCube(pd.DataFrame(columns=DIMENSIONS + MEASURES + ["student_id"]))
+        cube.add_cells(cells[DIMENSIONS], moments, members)
+        return cube
+
+    def build_students(self):
+        """StudentFeatures with the (student, course) cells aggregated inside SQLite"""
+        score, x = _quote(TARGET), _quote("assessment_no")
+        terms = [
+            "COUNT(*)", f"SUM({score})", f"MIN({score})", f"MAX({score})",
+            f"SUM({x})", f"SUM({x} * {x})", f"SUM({x} * {score})", f"SUM({_quote('attendance_rate')})",
+        ] + [f"SUM({_quote(col)})" for col in ENGAGEMENT]
+        db = self._db()
+        cells = pd.read_sql_query(
+            f"SELECT student_id, course_name, {', '.join(terms)} FROM {self.table} GROUP BY student_id, course_name", db
+        )
+        cells.columns = CELL_KEYS + list(AGGREGATIONS)
+        attributes = pd.read_sql_query(
+            f"SELECT student_id, {', '.join(f'MIN({_quote(col)}) AS {_quote(col)}' for col in ATTRIBUTES)} "
+            f"FROM {self.table} GROUP BY student_id", db
+        )
+        students = StudentFeatures()
+        students.add_cells(cells.set_index(CELL_KEYS), attributes.set_index("student_id"))
+        return students
+
+    def select(self, filters=None):
+        """Resolve a st.session_state.filters style dict to an SQLSelection"""
+        filters = filters or {}
+        clauses, params = [], []
+        for key, dim in FILTER_KEYS.items():
+            wanted = [str(level) for level in filters.get(key) or []]
+            if wanted:
+                clauses.append(f"{_quote(dim)} IN ({', '.join('?' * len(wanted))})")
+                params.extend(wanted)
+        return SQLSelection(self, " AND ".join(clauses), params)
+
+
+class SQLSelection:
+    """Filtered view of an SQLiteStore; every method runs one aggregate query"""
+
+    def __init__(self, store, where, params):
+        self.store = store
+        self.where = where
+        self.params = params
+        self._len = None
+
+    def _query(self, select, extra="", params=()):
+        conditions = " AND ".join(c for c in (self.where, extra) if c)
+        sql = f"SELECT {select} FROM {self.store.table}" + (f" WHERE {conditions}" if conditions else "")
+        return sql, [*self.params, *params]
+
+    def __len__(self):
+        if self._len is None:
+            sql, params = self._query("COUNT(*)")
+            self._len = self.store._db().execute(sql, params).fetchone()[0]
+        return self._len
+
+    @property
+    def is_full(self):
+        return not self.where
+
+    def sample(self, columns, n, seed=0):
+        """Float arrays of columns for at most n selected rows, drawn deterministically"""
+        sql, params = self._query(", ".join(_quote(col) for col in columns))
+        # A multiplicative hash of rowid gives a stable pseudo-random order
+        sql += f" ORDER BY (rowid * 2654435761 + {int(seed)}) % 4294967296 LIMIT {int(n)}"
+        rows = np.array(self.store._db().execute(sql, params).fetchall(), dtype=float).reshape(-1, len(columns))
+        return {col: rows[:, i] for i, col in enumerate(columns)}
+
+    def student_means(self, column):
+        """Mean of column per selected student"""
+        sql, params = self._query(f"AVG({_quote(column)})")
+        rows = self.store._db().execute(sql + " GROUP BY student_id", params).fetchall()
+        return np.array([row[0] for row in rows], dtype=float)
+
+    def count_where(self, column, op, value):
+        """Number of selected rows with op(column, value), op from the operator module"""
+        sql, params = self._query("COUNT(*)", f"{_quote(column)} {SQL_OPERATORS[op]} ?", [float(value)])
+        return self.store._db().execute(sql, params).fetchone()[0]
+
+
+def _read_chunks(path):
+    if path.lower().endswith((".xlsx", ".xls")):
+        yield pd.read_excel(path)
+    else:
+        yield from pd.read_csv(path, chunksize=CHUNK_ROWS)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the out-of-core SQLite store")
+    commands = parser.add_subparsers(dest="command", required=True)
+    load = commands.add_parser("import", help="append CSV/XLSX files to the store")
+    load.add_argument("files", nargs="+")
+    load.add_argument("--store", default=STORE_PATH)
+    args = parser.parse_args(argv)
+
+    store = SQLiteStore(args.store)
+    for path in args.files:
+        added = store.import_frames(_read_chunks(path))
+        print(f"{path}: {added:,} rows", file=sys.stderr)
+    print(f"{args.store}: {len(store):,} rows", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Per-student feature table for drill-down questions.
+
+The dataset has one row per assessment, so questions about students
+("Who are the top 5 students?", "Which students are at risk?") would
+otherwise need a groupby over every row. StudentFeatures keeps additive
+moments per (student, course) cell instead: assessment count, score
+sum, min and max, the sums needed for a least-squares trend over
+assessment number, and engagement totals. Appended rows are aggregated
+with one vectorized groupby and merged into the existing cells, so old
+rows are never rescanned.
+
+A StudentTable is the per-student view for one filter combination:
+mean/min/max score, trend (points per assessment), attendance,
+engagement totals and the percentile rank of each student's average.
+Each column gets a sorted index on first use, so top-k lists are a
+slice of it and threshold counts a binary search. StudentTable.compare
+ranks courses, classes or genders by their students rather than by
+their raw assessment averages.
+"""
+import operator
+import os
+
+import numpy as np
+import pandas as pd
+
+from cube import FILTER_KEYS, TARGET
+
+AT_RISK_SCORE = float(os.getenv("AT_RISK_SCORE", 60))
+TOP_SHARE = 0.25   # "top students" are the best quarter of the view
+
+ENGAGEMENT = ["raised_hand_count", "moodle_views", "resources_downloads"]
+ATTRIBUTES = ["student_name", "class_level", "student_gender"]
+CELL_KEYS = ["student_id", "course_name"]
+
+# How each cell column combines when cells are merged or rolled up per student
+AGGREGATIONS = {
+    "assessments": "sum",
+    "score_sum": "sum",
+    "score_min": "min",
+    "score_max": "max",
+    "x_sum": "sum",
+    "xx_sum": "sum",
+    "xy_sum": "sum",
+    "attendance_sum": "sum",
+    **{col: "sum" for col in ENGAGEMENT},
+}
+
+
+def aggregate_cells(df):
+    """(student, course) cells and per-student attributes for assessment rows"""
+    x = df["assessment_no"].to_numpy(dtype=np.float64)
+    y = df[TARGET].to_numpy(dtype=np.float64)
+    frame = pd.DataFrame({
+        "student_id": df["student_id"].to_numpy(),
+        "course_name": df["course_name"].astype(str).to_numpy(),
+        "assessments": np.ones(len(df), dtype=np.int64),
+        "score_sum": y,
+        "score_min": y,
+        "score_max": y,
+        "x_sum": x,
+        "xx_sum": x * x,
+        "xy_sum": x * y,
+        "attendance_sum": df["attendance_rate"].to_numpy(dtype=np.float64),
+        **{col: df[col].to_numpy(dtype=np.int64) for col in ENGAGEMENT},
+    })
+    cells = frame.groupby(CELL_KEYS, sort=False).agg(AGGREGATIONS)
+    attributes = (
+        df[["student_id"] + ATTRIBUTES].drop_duplicates("student_id")
+        .astype({col: str for col in ATTRIBUTES}).set_index("student_id")
+    )
+    return cells, attributes
+
+
+class StudentFeatures:
+    """Mergeable per-(student, course) moments, rolled up into StudentTables"""
+
+    def __init__(self, df=None):
+        self.cells = pd.DataFrame(
+            columns=list(AGGREGATIONS),
+            index=pd.MultiIndex.from_arrays([[], []], names=CELL_KEYS),
+        )
+        self.attributes = pd.DataFrame(columns=ATTRIBUTES, index=pd.Index([], name="student_id"))
+        if df is not None and len(df):
+            self.append(df)
+
+    def __len__(self):
+        return len(self.attributes)
+
+    def append(self, df):
+        """Fold assessment rows into the cells"""
+        self.add_cells(*aggregate_cells(df))
+
+    def add_cells(self, cells, attributes):
+        """Merge pre-aggregated cells (e.g. from a SQL GROUP BY) and student attributes"""
+        if len(self.cells):
+            cells = pd.concat([self.cells, cells]).groupby(level=CELL_KEYS, sort=False).agg(AGGREGATIONS)
+        self.cells = cells
+        new = attributes[~attributes.index.isin(self.attributes.index)]
+        self.attributes = pd.concat([self.attributes, new]) if len(self.attributes) else new
+
+    def table(self, filters=None):
+        """StudentTable over the assessments a st.session_state.filters style dict selects"""
+        filters = filters or {}
+        cells = self.cells
+        mask = np.ones(len(cells), dtype=bool)
+        courses = filters.get("course")
+        if courses:
+            mask &= cells.index.get_level_values("course_name").isin([str(c) for c in courses])
+
+        students = self.attributes
+        for key in ("class", "gender"):
+            wanted = filters.get(key)
+            if wanted:
+                students = students[students[FILTER_KEYS[key]].isin([str(w) for w in wanted])]
+        if len(students) < len(self.attributes):
+            mask &= cells.index.get_level_values("student_id").isin(students.index)
+
+        cells = cells[mask]
+        totals = cells.groupby(level="student_id", sort=False).agg(AGGREGATIONS)
+        return StudentTable(totals, self.attributes, cells)
+
+
+class StudentTable:
+    """Features of the selected students, with lazily built sorted indexes"""
+
+    def __init__(self, totals, attributes, cells=None):
+        n = totals["assessments"].to_numpy(dtype=np.float64)
+        sx, sxx = totals["x_sum"].to_numpy(), totals["xx_sum"].to_numpy()
+        sy, sxy = totals["score_sum"].to_numpy(), totals["xy_sum"].to_numpy()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            trend = (n * sxy - sx * sy) / (n * sxx - sx * sx)
+        mean = sy / n
+
+        self.features = attributes.reindex(totals.index).assign(
+            assessments=totals["assessments"].to_numpy(),
+            mean_score=mean,
+            min_score=totals["score_min"].to_numpy(dtype=np.float64),
+            max_score=totals["score_max"].to_numpy(dtype=np.float64),
+            trend=np.where(np.isfinite(trend), trend, 0.0),
+            attendance=totals["attendance_sum"].to_numpy() / n,
+            **{col: totals[col].to_numpy() for col in ENGAGEMENT},
+            percentile=pd.Series(mean).rank(pct=True).to_numpy() * 100,
+        )
+        self.cells = cells
+        self._indexes = {}
+
+    def __len__(self):
+        return len(self.features)
+
+    def _index(self, column):
+        """(order, sorted values) of column, ascending"""
+        index = self._indexes.get(column)
+        if index is None:
+            values = self.features[column].to_numpy()
+            order = np.argsort(values, kind="stable")
+            index = self._indexes[column] = (order, values[order])
+        return index
+
+    def top(self, k, column="mean_score", best=True):
+        """The k students with the highest (or, with best=False, lowest) column"""
+        order, _ = self._index(column)
+        rows = order[::-1][:k] if best else order[:k]
+        return self.features.iloc[rows]
+
+    def count_where(self, op, value, column="mean_score"):
+        """Number of students with op(column, value), op from the operator module"""
+        _, values = self._index(column)
+        if op in (operator.gt, operator.le):
+            split = np.searchsorted(values, value, side="right")
+        else:
+            split = np.searchsorted(values, value, side="left")
+        return len(values) - split if op in (operator.gt, operator.ge) else split
+
+    def compare(self, dim, top_share=TOP_SHARE):
+        """Per level of dim: students, mean of their averages and share in the view's top_share
+
+        A student's average is over that course's assessments for
+        course_name, and over every selected course for class_level and
+        student_gender. Sorted by top-student share, best first.
+        """
+        if dim == "course_name":
+            averages = (self.cells["score_sum"] / self.cells["assessments"]).to_numpy(dtype=np.float64)
+            levels = self.cells.index.get_level_values("course_name")
+        else:
+            averages = self.features["mean_score"].to_numpy()
+            levels = self.features[dim].to_numpy()
+        cutoff = np.quantile(averages, 1 - top_share)
+        frame = pd.DataFrame({"level": levels, "average": averages, "top": averages >= cutoff})
+        groups = frame.groupby("level", sort=False).agg(
+            students=("average", "size"), mean_average=("average", "mean"), top_share=("top", "mean"),
+        )
+        return groups.rename_axis(dim).sort_values(["top_share", "mean_average"], ascending=False)
+
+    def below(self, value, column="mean_score"):
+        """Students with column below value, lowest first"""
+        order, values = self._index(column)
+        return self.features.iloc[order[:np.searchsorted(values, value, side="left")]]
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from engine import Engine  # noqa: E402
+from llm_backends import TemplateBackend  # noqa: E402
+from response_cache import ResponseCache  # noqa: E402
+from synthetic import synthetic_dataset  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def dataset():
+    return synthetic_dataset(4000, seed=1)
+
+
+@pytest.fixture
+def engine(dataset):
+    """Engine over synthetic data with the offline template backend and a throwaway response cache"""
+    return Engine(dataset, "test", client=TemplateBackend(), response_cache=ResponseCache(":memory:"))
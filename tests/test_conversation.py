@@ -0,0 +1,69 @@
+import pytest
+
+from conversation import Conversation
+
+
+def ask(engine, conversation, question):
+    answer, _, meta = engine.smart_answer(question, conversation=conversation)
+    conversation.record(answer)
+    return answer, meta
+
+
+@pytest.mark.parametrize("first, follow_up, expected, unexpected", [
+    ("How many students score above 80?", "and above 90?", "above 90", "above 80"),
+    ("Who are the top 5 students?", "what about the top 10?", "Top 10 students", "Top 5 students"),
+    ("Which class performs best?", "and the worst?", "Lowest class", "Top class"),
+])
+def test_follow_up_numbers_replace_the_earlier_ones(engine, first, follow_up, expected, unexpected):
+    conversation = Conversation()
+    ask(engine, conversation, first)
+    answer, meta = ask(engine, conversation, follow_up)
+    assert meta["path"] == "local"
+    assert expected in answer and unexpected not in answer
+
+
+def test_top_10_follow_up_lists_ten_students(engine):
+    conversation = Conversation()
+    ask(engine, conversation, "Who are the top 5 students?")
+    answer, _ = ask(engine, conversation, "what about the top 10?")
+    assert sum(line.startswith("| Student_") for line in answer.splitlines()) == 10
+
+
+@pytest.mark.parametrize("message", ["Thanks!", "Hello there"])
+def test_messages_naming_nothing_are_not_follow_ups(engine, message):
+    conversation = Conversation()
+    ask(engine, conversation, "Compare all courses performance")
+    _, meta = ask(engine, conversation, message)
+    assert "resolved_question" not in meta
+
+
+def test_follow_up_answers_are_not_shared_through_the_cache(engine):
+    a, b = Conversation(), Conversation()
+    for question in ("Why is Biology doing poorly?", "and Chemistry?", "and for males?"):
+        ask(engine, a, question)
+    for question in ("Why is Biology doing poorly?", "and for males?"):
+        _, meta = ask(engine, b, question)
+    assert meta["path"] == "llm" and not meta["cached"]
+
+
+def test_standalone_questions_in_a_conversation_still_use_the_cache(engine):
+    engine.smart_answer("Why is Biology doing poorly?")
+    conversation = Conversation()
+    ask(engine, conversation, "Compare all courses performance")
+    _, meta = ask(engine, conversation, "Why is Biology doing poorly?")
+    assert meta["cached"]
+
+
+@pytest.mark.parametrize("question, follow_up", [
+    ("females?", True),
+    ("above 90?", True),
+    ("Who is the best?", True),
+    ("and why?", True),
+    ("Thanks!", False),
+    ("Why is Biology doing poorly?", False),
+    ("How many students score above 80?", False),
+])
+def test_is_follow_up(engine, question, follow_up):
+    conversation = Conversation()
+    ask(engine, conversation, "Which class performs best?")
+    assert conversation.is_follow_up(engine.router.classify(question)) == follow_up
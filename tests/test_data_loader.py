@@ -0,0 +1,41 @@
+import pandas as pd
+import pytest
+
+from data_loader import freeze
+
+
+@pytest.fixture
+def frozen(dataset):
+    return freeze(dataset.head(100))
+
+
+@pytest.mark.parametrize("write", [
+    lambda df: df.loc.__setitem__((0, "assessment_score"), 5),
+    lambda df: df["assessment_score"].to_numpy().__setitem__(0, 5),
+    lambda df: df.__setitem__("x", 1),
+    lambda df: df.__setitem__("assessment_score", 1),
+    lambda df: df.__delitem__("assessment_score"),
+    lambda df: df.insert(0, "x", 1),
+    lambda df: df.pop("assessment_score"),
+    lambda df: df.rename(columns={"assessment_score": "score"}, inplace=True),
+    lambda df: df.drop(columns=["assessment_score"], inplace=True),
+    lambda df: setattr(df, "columns", list(df.columns)),
+    lambda df: setattr(df, "assessment_score", 1),
+])
+def test_in_place_writes_raise(frozen, write):
+    columns = list(frozen.columns)
+    with pytest.raises(ValueError):
+        write(frozen)
+    assert list(frozen.columns) == columns
+
+
+def test_derived_frames_are_writable(frozen):
+    for derived in (frozen.copy(), frozen[["assessment_score"]], frozen.head(5),
+                    pd.concat([frozen, frozen], ignore_index=True)):
+        assert type(derived) is pd.DataFrame
+        derived["x"] = 1
+
+
+def test_engine_dataset_is_frozen(engine):
+    with pytest.raises(ValueError):
+        engine.df["x"] = 1
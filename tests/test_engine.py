@@ -0,0 +1,34 @@
+from conversation import Conversation
+from llm_backends import TemplateBackend
+
+
+class FailingBackend(TemplateBackend):
+    def complete(self, **request):
+        raise RuntimeError("backend down")
+
+    def stream(self, **request):
+        raise RuntimeError("backend down")
+
+
+def test_stream_error_returns_the_error_message(engine):
+    engine.client = FailingBackend()
+    tokens, chart, meta = engine.smart_answer("Why do some classes do better?", stream=True,
+                                              conversation=Conversation())
+    assert meta["error"]
+    assert "backend down" in "".join(tokens)
+    assert chart.result() is None
+
+
+def test_error_returns_the_error_message(engine):
+    engine.client = FailingBackend()
+    answer, chart, meta = engine.smart_answer("Why do some classes do better?")
+    assert meta["error"] and "backend down" in answer and chart is None
+
+
+def test_follow_up_is_answered_as_the_standalone_question(engine):
+    conversation = Conversation()
+    answer, _, _ = engine.smart_answer("Which class performs best?", conversation=conversation)
+    conversation.record(answer)
+    _, _, meta = engine.smart_answer("and for females?", conversation=conversation)
+    assert meta["resolved_question"] == "Which class performs best? (and for females?)"
+    assert meta["path"] == "local"
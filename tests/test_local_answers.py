@@ -0,0 +1,93 @@
+import pytest
+
+from local_answers import plan_question
+
+
+@pytest.mark.parametrize("question", [
+    # Engagement measures, not the score
+    "What is the average attendance?",
+    "What is the average number of moodle views?",
+    "How many students raised their hand more than 15 times?",
+    "How many students have attendance below 50?",
+    "Which gender has the highest attendance?",
+    # Named levels the plan would not apply
+    "How many students score above 80 in Biology?",
+    "How many female students score below 60?",
+    "Which class performs best in Biology?",
+    # More than the dataset size
+    "How many students failed?",
+    "How many students scored 100?",
+    # Thresholds on something other than the score, or with conditions the plan would drop
+    "How many students take more than 3 courses?",
+    "How many students have more than 2 assessments?",
+    "How many students score above 80 and below 90?",
+    "How many students score above 80 on assessment 2?",
+])
+def test_questions_the_plans_cannot_answer_go_to_the_llm(engine, question):
+    assert plan_question(engine.router.classify(question)) is None
+
+
+@pytest.mark.parametrize("question, kind", [
+    ("How many students score above 80?", "threshold"),
+    ("How many students scored at least 90?", "threshold"),
+    ("How many students have marks below 50?", "threshold"),
+    ("Which class performs best?", "rank"),
+    ("What is the average score?", "average"),
+    ("What is the average score in Biology?", "average"),
+    ("What is the average score by course?", "average_by"),
+    ("How many students are there?", "count"),
+    ("Who are the top 5 students?", "students"),
+])
+def test_numeric_questions_are_planned(engine, question, kind):
+    plan = plan_question(engine.router.classify(question))
+    assert plan is not None and plan[0] == kind
+
+
+def test_average_for_a_named_level_uses_that_level(engine):
+    answer, _, meta = engine.smart_answer("What is the average score in Biology?")
+    biology = engine.summary().scores_by("course_name")["Biology"]
+    assert meta["path"] == "local"
+    assert f"**{biology:.1f}**" in answer
+
+
+def _student_classes(answer):
+    return {line.split("|")[2].strip() for line in answer.splitlines() if line.startswith("| Student_")}
+
+
+@pytest.mark.parametrize("question", [
+    "Who are the top 5 students in C1?",
+    "Who are the best students in class C1?",
+    "Which C1 students are at risk?",
+])
+def test_student_questions_apply_named_levels(engine, question):
+    answer, _, meta = engine.smart_answer(question)
+    assert meta["path"] == "local"
+    assert "Top class" not in answer
+    assert _student_classes(answer) == {"C1"}
+
+
+def test_student_question_for_a_level_the_filters_exclude_is_not_answered_locally(engine):
+    answer, _, meta = engine.smart_answer("Who are the top 5 students in C1?", {"class": ["C2"]})
+    assert meta["path"] != "local"
+    assert "Top class" not in answer
+
+
+@pytest.mark.parametrize("question, dim", [
+    ("Which course has the best students?", "course_name"),
+    ("Which class has the worst students?", "class_level"),
+])
+def test_best_students_by_level_ranks_on_the_student_table(engine, question, dim):
+    answer, _, meta = engine.smart_answer(question)
+    assert meta["path"] == "local"
+    assert "Top course" not in answer and "Top class" not in answer
+    assert "top 25%" in answer
+
+
+def test_student_compare_uses_per_course_student_averages(engine, dataset):
+    groups = engine.student_table().compare("course_name")
+    cells = dataset.groupby(["course_name", "student_id"], observed=True)["assessment_score"].mean()
+    cutoff = cells.quantile(0.75)
+    expected = (cells >= cutoff).groupby(level="course_name", observed=True).mean()
+    for course, share in expected.items():
+        assert groups.loc[course, "top_share"] == pytest.approx(share)
+    assert list(groups["top_share"]) == sorted(groups["top_share"], reverse=True)
@@ -0,0 +1,41 @@
+import pytest
+
+from refresh import CsvDropSource
+
+
+@pytest.fixture
+def drop(tmp_path, engine, dataset):
+    folder = tmp_path / "drop"
+    folder.mkdir()
+    engine.sources = [CsvDropSource(str(folder))]
+    return folder
+
+
+def test_bad_file_is_rejected_and_good_rows_are_merged(engine, dataset, drop):
+    records = engine.records
+    dataset.iloc[:10].to_csv(drop / "good.csv", index=False)
+    bad = dataset.iloc[10:12].copy()
+    bad["assessment_score"] = [105.0, 50.0]
+    bad.to_csv(drop / "bad.csv", index=False)
+
+    assert engine.refresh() == 10
+    assert engine.records == records + 10
+    assert (drop / "rejected" / "bad.csv").exists()
+    assert engine.refresh() == 0
+
+
+def test_failed_merge_offers_the_rows_again(engine, dataset, drop, monkeypatch):
+    records = engine.records
+    dataset.iloc[:10].to_csv(drop / "good.csv", index=False)
+    append = engine.append
+
+    def failing_append(rows):
+        raise MemoryError("merge failed")
+
+    monkeypatch.setattr(engine, "append", failing_append)
+    with pytest.raises(MemoryError):
+        engine.refresh()
+
+    monkeypatch.setattr(engine, "append", append)
+    assert engine.refresh() == 10
+    assert engine.records == records + 10
@@ -0,0 +1,40 @@
+import sqlite3
+
+from engine import Engine
+from llm_backends import TemplateBackend
+from refresh import CsvDropSource, SQLiteSource
+from response_cache import ResponseCache
+from store import SQLiteStore
+
+
+def store_engine(path, sources):
+    return Engine(None, None, store=SQLiteStore(path), sources=sources,
+                  client=TemplateBackend(), response_cache=ResponseCache(":memory:"))
+
+
+def test_restarts_do_not_replay_sources_into_the_store(tmp_path, dataset):
+    base, drop = dataset.iloc[:200], tmp_path / "drop"
+    drop.mkdir()
+    SQLiteStore(str(tmp_path / "store.sqlite3")).import_frames([base])
+    dataset.iloc[200:210].to_csv(drop / "batch1.csv", index=False)
+    with sqlite3.connect(tmp_path / "feed.sqlite3") as db:
+        dataset.iloc[210:215].astype({"student_name": str, "student_gender": str, "class_level": str,
+                                      "course_name": str}).to_sql("assessments", db, index=False)
+
+    def start():
+        return store_engine(str(tmp_path / "store.sqlite3"),
+                            [CsvDropSource(str(drop)), SQLiteSource(str(tmp_path / "feed.sqlite3"))])
+
+    engine = start()
+    assert engine.refresh() == 15
+    assert len(engine.store) == 215
+
+    for _ in range(3):
+        engine = start()
+        assert engine.refresh() == 0
+        assert len(engine.store) == 215
+
+    # New files are still picked up after a restart
+    dataset.iloc[215:220].to_csv(drop / "batch2.csv", index=False)
+    assert start().refresh() == 5
+    assert len(engine.store) == 220
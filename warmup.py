@@ -0,0 +1,116 @@
+"""
+Background warm-up of the Quick Start example answers.
+
+The example buttons are the most common questions, so a Warmup answers
+every one of them on a background thread: under the unfiltered dataset,
+under any filter combinations listed in WARMUP_FILTERS (a JSON list of
+filter dicts) and under the WARMUP_TOP_FILTERS combinations sessions
+have used most. LLM answers land in the response cache, summaries and
+student tables in the Engine's memos, and each chart spec is handed to
+on_chart (the app uses it to pre-build the Plotly figure), so a click
+renders from caches instead of waiting on a round trip.
+
+A Warmup runs once at start() and again whenever the Engine's data
+changes. A run that finds the dataset version has moved on stops early
+and starts over on the new version. Set WARMUP=0 to disable it.
+"""
+import json
+import os
+import threading
+import time
+
+from filter_index import canonical_filters
+
+EXAMPLE_QUESTIONS = [
+    "📊 Compare all courses performance",
+    "👥 Show me gender performance breakdown",
+    "📈 What correlates with high scores?",
+    "🎯 Which class performs best?",
+    "🔍 How many students score above 80?",
+    "💡 Tell me something interesting about the data",
+    "⭐ Which course has the best students?",
+    "📉 Are there any concerning trends?"
+]
+
+WARMUP_ENABLED = os.getenv("WARMUP", "1").lower() not in ("0", "false", "no")
+WARMUP_FILTERS = json.loads(os.getenv("WARMUP_FILTERS", "[]"))
+WARMUP_TOP_FILTERS = int(os.getenv("WARMUP_TOP_FILTERS", 3))
+
+
+class Warmup:
+    """Answers questions ahead of time on a background thread"""
+
+    def __init__(self, engine, questions=EXAMPLE_QUESTIONS, filters=WARMUP_FILTERS,
+                 top_filters=WARMUP_TOP_FILTERS, on_chart=None):
+        self.engine = engine
+        self.questions = list(questions)
+        self.filters = list(filters)
+        self.top_filters = top_filters
+        self.on_chart = on_chart
+        self.version = None      # dataset version of the last completed run
+        self.answered = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self._thread = None
+        self._lock = threading.Lock()
+        engine.on_update.append(self.start)
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def filter_sets(self):
+        """Unfiltered, configured and most used filter combinations, without duplicates"""
+        candidates = [{}, *self.filters, *self.engine.top_filters(self.top_filters)]
+        unique = {}
+        for filters in candidates:
+            unique.setdefault(canonical_filters(filters), filters)
+        return list(unique.values())
+
+    def start(self):
+        """Start a run unless one is in progress; a running one picks up new data itself"""
+        if not WARMUP_ENABLED:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            version = self.engine.version
+            self._warm(version)
+            with self._lock:
+                if self.engine.version == version:
+                    self.version = version
+                    self._thread = None
+                    return
+
+    def _warm(self, version):
+        start = time.perf_counter()
+        answered = errors = 0
+        for filters in self.filter_sets():
+            for question in self.questions:
+                if self.engine.version != version:
+                    return
+                try:
+                    _, chart, meta = self.engine.smart_answer(question, filters, record=False)
+                    if chart and self.on_chart:
+                        self.on_chart(chart)
+                except Exception:
+                    meta = {"error": True}
+                if meta.get("error"):
+                    errors += 1
+                else:
+                    answered += 1
+        self.answered, self.errors = answered, errors
+        self.seconds = time.perf_counter() - start
+
+    def status(self):
+        return {
+            "running": self.running,
+            "version": self.version,
+            "answered": self.answered,
+            "errors": self.errors,
+            "seconds": round(self.seconds, 3),
+        }